@@ -0,0 +1,162 @@
+# Zulassungskontrolle für die API: Token-Bucket pro Client (JWT-Identität, sonst IP-Adresse) und Route
+# sowie eine Obergrenze gleichzeitig bearbeiteter Requests pro Worker. Abgelehnte Requests erhalten
+# 429 (Rate-Limit) bzw. 503 (Überlast) mit Retry-After, bevor sie die Datenbank erreichen.
+# Geprüft werden alle Endpunkte der Blueprints in ADMISSION_BLUEPRINTS sowie einzelne Endpunkte anderer
+# Blueprints, die in ADMISSION_LIMITS eine eigene Grenze haben (z.B. web.availability_stream).
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+import zlib
+from flask import g, jsonify, request, session
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+# Grenze im Format "Rate/Burst" (Tokens pro Sekunde / Bucket-Grösse), z.B. "5/10"
+def parse_limit(value):
+    rate, burst = value.split('/')
+    return float(rate), float(burst)
+
+# Grenzen pro Endpunkt aus "endpunkt=rate/burst,..." (z.B. aus einer Umgebungsvariable)
+def parse_limits(value):
+    limits = {}
+    for item in (value or '').split(','):
+        if item.strip():
+            endpoint, limit = item.split('=')
+            limits[endpoint.strip()] = parse_limit(limit.strip())
+    return limits
+
+# Bucket auffüllen und ein Token entnehmen; liefert (neuer Zustand, Wartezeit in Sekunden oder 0)
+def _take(state, rate, burst, now):
+    tokens, updated = state if state is not None else (burst, now)
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / rate
+
+# Voller Bucket: Eintrag kann entfallen (wird beim nächsten Zugriff neu angelegt)
+def _is_full(state, rate, burst, now):
+    return state[0] + (now - state[1]) * rate >= burst
+
+# Bucket-Zustände im Speicher des eigenen Prozesses (Einzelprozess / Tests)
+class MemoryBucketStore:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {} # Schlüssel -> (Tokens, Zeitpunkt, Rate, Burst)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        with self._lock:
+            entry = self._buckets.get(key)
+            state, retry_after = _take(entry[:2] if entry else None, rate, burst, now)
+            self._buckets[key] = state + (rate, burst)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return retry_after
+
+    def _prune(self, now):
+        for key, (tokens, updated, rate, burst) in list(self._buckets.items()):
+            if _is_full((tokens, updated), rate, burst, now):
+                del self._buckets[key]
+
+# Bucket-Zustände für alle Worker in gesperrten JSON-Dateien (Schlüssel werden auf "shards" Dateien verteilt)
+class FileBucketStore:
+    def __init__(self, directory, shards=64):
+        self.directory = directory
+        self.shards = shards
+        os.makedirs(directory, exist_ok=True)
+
+    def take(self, key, rate, burst):
+        path = os.path.join(self.directory, '%02d.json' % (zlib.crc32(key.encode()) % self.shards))
+        with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT), 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                try:
+                    buckets = json.loads(f.read() or '{}')
+                except ValueError:
+                    buckets = {} # Beschädigte Datei: Buckets beginnen voll
+                now = time.time()
+                entry = buckets.get(key)
+                state, retry_after = _take(entry[:2] if entry else None, rate, burst, now)
+                buckets[key] = list(state) + [rate, burst]
+                # Volle Buckets nicht mehr speichern, damit die Dateien klein bleiben (jeder Eintrag wird
+                # mit seiner eigenen Rate und Grösse geprüft, die Schlüssel gehören zu verschiedenen Routen)
+                buckets = {name: value for name, value in buckets.items() if name == key or
+                           (len(value) == 4 and not _is_full(value[:2], value[2], value[3], now))}
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(buckets, separators=(',', ':')))
+                return retry_after
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class AdmissionControl:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.rejected = {} # (Endpunkt, Grund) -> Anzahl
+        self._rejected_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ADMISSION_ENABLED', True)
+        self.blueprints = set(app.config.get('ADMISSION_BLUEPRINTS', ('api',)))
+        self.default_limit = parse_limit(app.config.get('ADMISSION_DEFAULT_LIMIT', '20/40'))
+        self.limits = parse_limits(app.config.get('ADMISSION_LIMITS'))
+        self.max_concurrent = app.config.get('ADMISSION_MAX_CONCURRENT', 0) # 0 = ohne Obergrenze
+        self.queue_timeout = app.config.get('ADMISSION_QUEUE_TIMEOUT', 0.1) # Sekunden Wartezeit auf einen Platz
+        self._slots = threading.BoundedSemaphore(self.max_concurrent) if self.max_concurrent else None
+        if app.config.get('ADMISSION_STORE', 'file') == 'memory':
+            self.store = MemoryBucketStore()
+        else:
+            directory = app.config.get('ADMISSION_DIR') or os.path.join(app.instance_path, 'admission')
+            self.store = FileBucketStore(directory)
+        if self.enabled:
+            app.before_request(self._admit)
+            app.teardown_request(self._release)
+
+    # Schlüssel des Clients: JWT-Identität, falls ein gültiges Token mitgeschickt wurde, bei der
+    # Web-Oberfläche der angemeldete Benutzer aus der Session (ohne Datenbankabfrage), sonst IP-Adresse
+    def _client_key(self):
+        if request.blueprint == 'web':
+            identity = session.get('_user_id') # Von Flask-Login gesetzt
+        else:
+            try:
+                verify_jwt_in_request(optional=True)
+                identity = get_jwt_identity()
+            except Exception:
+                identity = None # Ungültiges Token: die Route antwortet selbst mit 401
+        return 'user:%s' % identity if identity is not None else 'ip:%s' % request.remote_addr
+
+    def _reject(self, status, reason, retry_after, message):
+        with self._rejected_lock:
+            key = (request.endpoint, reason)
+            self.rejected[key] = self.rejected.get(key, 0) + 1
+        response = jsonify({'error': message})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def _admit(self):
+        if request.endpoint is None or (request.blueprint not in self.blueprints and request.endpoint not in self.limits):
+            return None
+        rate, burst = self.limits.get(request.endpoint, self.default_limit)
+        retry_after = self.store.take('%s|%s' % (request.endpoint, self._client_key()), rate, burst)
+        if retry_after:
+            return self._reject(429, 'rate_limit', retry_after, 'Zu viele Anfragen')
+        if self._slots is not None:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                return self._reject(503, 'overload', 1, 'Server ausgelastet, bitte später erneut versuchen')
+            g.admission_slot = True
+
+    def _release(self, exc):
+        if g.pop('admission_slot', False):
+            self._slots.release()
+
+    # Werte für metrics.Metrics.register_collector()
+    def collect_metrics(self):
+        with self._rejected_lock:
+            return [('admission_rejected_total', {'endpoint': endpoint, 'reason': reason}, count)
+                    for (endpoint, reason), count in self.rejected.items()]
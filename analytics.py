@@ -0,0 +1,155 @@
+# Auslastungsberichte der Flotte: gebuchte Stunden / verfügbare Stunden pro Auto und Marke,
+# aufgeteilt in Tages- oder Wochen-Intervalle. Die Aggregation läuft in einer einzigen SQL-Abfrage.
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import select, func, cast, case, literal, union_all, Integer, DateTime
+from app import db, table_versions
+from models import Booking, BookingArchive, Car
+from booking_archive import includes_archive
+from user_cache import TTLCache
+from replica_routing import use_primary
+
+GRANULARITIES = {'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+MAX_BUCKETS = 400 # Obergrenze für die Anzahl Intervalle pro Bericht
+
+# Ergebnisse pro (Zeitraum, Granularität); der Schlüssel enthält die Tabellenversionen,
+# sodass Änderungen an Buchungen oder Autos automatisch zu einer Neuberechnung führen.
+# Berechnet wird auf der Primärdatenbank: Ein nachhängendes Replikat würde veraltete Zahlen unter der
+# neuen Version speichern, die auch nach dem Aufholen des Replikats bestehen blieben.
+# Der Cache liegt pro Anwendung in app.extensions (die Tabellenversionen gelten nur für deren Datenbank).
+def report_cache():
+    cache = current_app.extensions.get('report_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('report_cache', TTLCache(maxsize=128, ttl=3600))
+    return cache
+
+# Dialektabhängige Ausdrücke: Sekunden seit 1970, Abrunden, Minimum/Maximum zweier Werte
+def _epoch(expr, dialect):
+    if dialect == 'sqlite':
+        return (func.julianday(expr) - 2440587.5) * 86400.0
+    if dialect == 'postgresql':
+        return func.extract('epoch', expr)
+    return func.unix_timestamp(expr)
+
+def _floor(expr, dialect):
+    return cast(expr, Integer) if dialect == 'sqlite' else func.floor(expr) # SQLite: Werte sind hier nie negativ
+
+def _least(a, b, dialect):
+    return func.min(a, b) if dialect == 'sqlite' else func.least(a, b)
+
+def _greatest(a, b, dialect):
+    return func.max(a, b) if dialect == 'sqlite' else func.greatest(a, b)
+
+# Gebuchte Sekunden pro (car_id, Intervall) – auf den Zeitraum zugeschnitten. Ohne Join auf eine
+# Intervalltabelle: Anfangs- und Endintervall einer Buchung erhalten die Teilsekunden, die vollständig
+# überdeckten Intervalle dazwischen werden über Zähler (opens/closes) markiert und in Python aufsummiert.
+def _booked_hours(range_start, range_end, bucket_seconds, bucket_count, dialect):
+    total = (range_end - range_start).total_seconds()
+    origin = _epoch(literal(range_start, DateTime), dialect)
+
+    # Buchungen im Zeitraum als Sekunden-Offsets relativ zum Beginn, abgeschnitten auf [0, total]
+    def clipped_rows(model):
+        return select(
+            model.car_id,
+            _greatest(_epoch(model.start_date, dialect) - origin, 0, dialect).label('s'),
+            _least(_epoch(model.end_date, dialect) - origin, total, dialect).label('e'),
+        ).where(model.start_date < range_end, model.end_date > range_start)
+
+    clipped = clipped_rows(Booking)
+    if includes_archive(range_start): # Vergangene Zeiträume: archivierte Buchungen einbeziehen
+        clipped = union_all(clipped, clipped_rows(BookingArchive))
+    clipped = clipped.subquery()
+    first = _floor(clipped.c.s / bucket_seconds, dialect)
+    last = _floor((clipped.c.e - 0.001) / bucket_seconds, dialect)
+    single = first == last
+
+    head = select(
+        clipped.c.car_id, first.label('idx'),
+        case((single, clipped.c.e - clipped.c.s), else_=(first + 1) * bucket_seconds - clipped.c.s).label('secs'),
+        case((single, 0), else_=1).label('opens'), literal(0).label('closes'),
+    )
+    tail = select(
+        clipped.c.car_id, last.label('idx'), (clipped.c.e - last * bucket_seconds).label('secs'),
+        literal(0).label('opens'), literal(1).label('closes'),
+    ).where(first < last)
+
+    combined = union_all(head, tail).subquery()
+    stmt = select(
+        combined.c.car_id, combined.c.idx, func.sum(combined.c.secs),
+        func.sum(combined.c.opens), func.sum(combined.c.closes),
+    ).group_by(combined.c.car_id, combined.c.idx)
+
+    rows = {}
+    for car_id, idx, secs, opens, closes in db.session.execute(stmt):
+        rows.setdefault(car_id, {})[int(idx)] = (float(secs), int(opens), int(closes))
+
+    booked = {}
+    for car_id, entries in rows.items():
+        hours, running = [0.0] * bucket_count, 0
+        for idx in range(min(entries), bucket_count):
+            secs, opens, closes = entries.get(idx, (0.0, 0, 0))
+            running -= closes
+            hours[idx] = (secs + running * bucket_seconds) / 3600
+            running += opens
+        booked[car_id] = hours
+    return booked
+
+def _ratio(booked, available):
+    return round(booked / available, 4) if available else 0.0
+
+# Bericht berechnen bzw. aus dem Cache liefern. Wirft ValueError bei ungültigen Parametern.
+def utilization_report(range_start, range_end, granularity):
+    if granularity not in GRANULARITIES:
+        raise ValueError('Ungültige Granularität')
+    if range_end <= range_start:
+        raise ValueError('Enddatum muss nach dem Startdatum liegen')
+    step = GRANULARITIES[granularity]
+    bucket_count = -(-(range_end - range_start) // step) # Aufrunden
+    if bucket_count > MAX_BUCKETS:
+        raise ValueError('Zeitraum zu gross (maximal %d Intervalle)' % MAX_BUCKETS)
+
+    key = (range_start, range_end, granularity, table_versions.version('booking'), table_versions.version('car'))
+    cache = report_cache()
+    report = cache.get(key)
+    if report is None:
+        with use_primary():
+            report = _compute_report(range_start, range_end, granularity, step, bucket_count)
+        cache.set(key, report)
+    return report
+
+# Bericht ohne Cache berechnen (eine Aggregationsabfrage plus Liste der Autos)
+def _compute_report(range_start, range_end, granularity, step, bucket_count):
+    dialect = db.session.get_bind().dialect.name
+    bucket_seconds = step.total_seconds()
+    # Verfügbare Stunden pro Intervall (das letzte Intervall kann kürzer sein)
+    bucket_starts = [range_start + i * step for i in range(bucket_count)]
+    available = [(min(start + step, range_end) - start).total_seconds() / 3600 for start in bucket_starts]
+
+    booked = _booked_hours(range_start, range_end, bucket_seconds, bucket_count, dialect)
+
+    total_available = sum(available)
+    cars, brands = [], {}
+    for car_id, brand, model in db.session.query(Car.id, Car.brand, Car.model).order_by(Car.id):
+        hours = booked.get(car_id, [0.0] * bucket_count)
+        total_booked = sum(hours)
+        cars.append({
+            'car_id': car_id, 'brand': brand, 'model': model,
+            'booked_hours': round(total_booked, 2), 'available_hours': round(total_available, 2),
+            'utilization': _ratio(total_booked, total_available),
+            'series': [_ratio(h, a) for h, a in zip(hours, available)],
+        })
+        entry = brands.setdefault(brand, {'brand': brand, 'cars': 0, 'hours': [0.0] * bucket_count})
+        entry['cars'] += 1
+        entry['hours'] = [a + b for a, b in zip(entry['hours'], hours)]
+
+    brand_rows = []
+    for entry in brands.values():
+        total_booked = sum(entry['hours'])
+        brand_rows.append({
+            'brand': entry['brand'], 'cars': entry['cars'],
+            'booked_hours': round(total_booked, 2), 'available_hours': round(total_available * entry['cars'], 2),
+            'utilization': _ratio(total_booked, total_available * entry['cars']),
+            'series': [_ratio(h, a * entry['cars']) for h, a in zip(entry['hours'], available)],
+        })
+
+    return {'granularity': granularity, 'buckets': bucket_starts, 'cars': cars, 'brands': brand_rows}
@@ -1,31 +1,156 @@
 # Import der benötigten Flask-Module
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import Config
+import engine_profiles
+from replica_routing import RoutingSession, ReplicaRouter
 from flask_jwt_extended import JWTManager
+from availability_cache import AvailabilityCache
+from slot_calendar import SlotCalendar
+from availability_events import AvailabilityEvents
+from query_stats import QueryStats
+from password_hashing import PasswordHasher
+from user_cache import UserCache
+from table_versions import TableVersions
+from metrics import Metrics
+from json_provider import FastJSONProvider
+from compression import Compression
+from admission import AdmissionControl
+from idempotency import Idempotency
+from extension_proxy import ExtensionProxy
 
-# Flask-Anwendung initialisieren
-app = Flask(__name__)
-# Konfiguration aus der Config-Klasse laden
-app.config.from_object(Config)
+# Erweiterungen werden ohne Anwendung angelegt und in create_app() gebunden, damit Module wie
+# models.py oder booking_service.py sie importieren können, ohne die App beim Import zu bauen.
+# Eigene Erweiterungen sind Stellvertreter (extension_proxy.py): jede Anwendung erhält in
+# app.extensions eigene Caches, Zähler und Hooks.
 
-# Initialisierung der Datenbank und Migration
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-# Flask-Login initialisieren
-login = LoginManager(app)
-login.login_view = 'login'
+# Datenbank
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Session mit Replikat-Routing
+replica_router = ExtensionProxy('replica_router', ReplicaRouter) # Lesende Requests an Replikate leiten
 
-# Konfiguration des JWT-Authentifizierungssystems
-app.config['JWT_SECRET_KEY'] = 'dein_geheimer_schlüssel'
-jwt = JWTManager(app)  # ✅ JWT Manager Initialisieren
+# Flask-Login (nur im Web-Profil aktiv)
+login = LoginManager()
+login.login_view = 'web.login'
 
-# Import der Routen für die Web-Oberfläche und API
-from routes import *
-from routes_api import api
+# JWT-Authentifizierungssystem
+jwt = JWTManager()
 
-# Registrierung des API-Blueprints in der Flask-App
-app.register_blueprint(api)
+# In-Memory-Verfügbarkeitsindex pro Auto
+availability_cache = ExtensionProxy('availability_cache', AvailabilityCache)
 
+# Monatskalender mit Slot-Belegung pro Auto
+slot_calendar = ExtensionProxy('slot_calendar', SlotCalendar)
+
+# Verfügbarkeitsänderungen per Server-Sent Events an offene Buchungsseiten pushen
+availability_events = ExtensionProxy('availability_events', AvailabilityEvents)
+
+# SQL-Abfragen pro Request zählen (Log, Debug-Header, N+1-Erkennung)
+query_stats = ExtensionProxy('query_stats', QueryStats)
+
+# Passwort-Hashing ausserhalb des Request-Threads
+password_hasher = ExtensionProxy('password_hasher', PasswordHasher)
+
+# Cache für die Benutzer-Identität (spart die Abfrage in load_user)
+user_cache = ExtensionProxy('user_cache', UserCache)
+
+# Änderungszähler pro Tabelle (Validatoren für bedingte GET-Anfragen)
+table_versions = ExtensionProxy('table_versions', TableVersions)
+
+# gzip-Komprimierung grosser Antworten
+compression = ExtensionProxy('compression', Compression)
+
+# Rate-Limits pro Client und Route, Obergrenze gleichzeitiger API-Requests
+admission = ExtensionProxy('admission', AdmissionControl)
+
+# Gespeicherte Antworten für Requests mit Idempotency-Key (Wiederholungen von Buchungen)
+idempotency = ExtensionProxy('idempotency', Idempotency)
+
+# Prometheus-Metriken unter /metrics (über alle Worker-Prozesse summiert)
+metrics = ExtensionProxy('metrics', Metrics)
+METRIC_DEFINITIONS = [
+    ('booking_conflicts_total', 'counter', 'Abgelehnte Buchungen wegen Überschneidung'),
+    ('login_failures_total', 'counter', 'Fehlgeschlagene Anmeldungen'),
+    ('password_hash_total', 'counter', 'Anzahl Passwort-Hash-Berechnungen'),
+    ('password_hash_seconds_total', 'counter', 'Summierte Dauer der Passwort-Hash-Berechnungen'),
+    ('user_cache_hits_total', 'counter', 'Treffer im Benutzer-Cache'),
+    ('user_cache_misses_total', 'counter', 'Fehlzugriffe im Benutzer-Cache'),
+    ('user_cache_evictions_total', 'counter', 'Verdrängte Einträge im Benutzer-Cache'),
+    ('db_pool_waits_total', 'counter', 'Angeforderte Verbindungen aus dem Pool'),
+    ('db_pool_wait_seconds_total', 'counter', 'Summierte Wartezeit auf Pool-Verbindungen'),
+    ('db_pool_timeouts_total', 'counter', 'Zeitüberschreitungen beim Warten auf den Pool'),
+    ('admission_rejected_total', 'counter', 'Abgewiesene API-Requests (rate_limit = 429, overload = 503)'),
+    ('idempotency_requests_total', 'counter', 'Requests mit Idempotency-Key nach Ergebnis'),
+    ('availability_streams_rejected_total', 'counter', 'Wegen der Obergrenze abgewiesene SSE-Verbindungen'),
+]
+# Erweiterungen, deren Zähler beim Schreiben der Metriken abgefragt werden (collect_metrics())
+METRIC_COLLECTORS = ('password_hasher', 'user_cache', 'admission', 'idempotency', 'availability_events')
+
+# Metriken der Anwendung definieren und die Zähler ihrer Erweiterungen anschliessen
+def init_metrics(app):
+    app_metrics = metrics.init_app(app)
+    for definition in METRIC_DEFINITIONS:
+        app_metrics.define(*definition)
+    for name in METRIC_COLLECTORS:
+        app_metrics.register_collector(app.extensions[name].collect_metrics)
+    app_metrics.register_collector(lambda: engine_profiles.pool_metrics(db)) # Läuft im App-Kontext (flush)
+
+# Profile: "web" = Web-Oberfläche (Formulare, Templates, Flask-Login) und API; "api" = nur die JSON-API
+PROFILES = ('web', 'api')
+
+# Anwendung erstellen (flask --app app ... und gunicorn "app:create_app()" rufen diese Funktion auf)
+def create_app(profile=None, config=Config):
+    profile = profile or os.getenv('APP_PROFILE', 'web')
+    if profile not in PROFILES:
+        raise ValueError('Unbekanntes Profil: %s' % profile)
+
+    # Flask-Anwendung initialisieren und Konfiguration aus der Config-Klasse laden
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config['APP_PROFILE'] = profile
+    app.json = FastJSONProvider(app) # orjson (falls installiert) und Datumswerte im API-Format
+
+    db.init_app(app)
+    # Migrationen (Alembic) nur für die Flask-CLI laden ("flask db upgrade"); Server-Worker brauchen sie nicht
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    engine_profiles.init_app(app, db) # SQLite-Pragmas (WAL, synchronous, busy_timeout)
+    engine_profiles.dispose_after_fork(app, db) # Keine Verbindungen des Gunicorn-Masters in den Workern weiterverwenden
+    replica_router.init_app(app, db)
+
+    # Konfiguration des JWT-Authentifizierungssystems
+    app.config['JWT_SECRET_KEY'] = 'dein_geheimer_schlüssel'
+    jwt.init_app(app)
+
+    # Vor allen anderen before_request-Funktionen: abgewiesene Requests kosten keine Datenbankabfrage
+    admission.init_app(app)
+
+    # Zuerst registrieren: after_request-Funktionen laufen in umgekehrter Reihenfolge, die Komprimierung
+    # sieht so die fertige Antwort (inkl. Header der anderen Erweiterungen)
+    compression.init_app(app)
+    availability_cache.init_app(app)
+    slot_calendar.init_app(app)
+    availability_events.init_app(app)
+    query_stats.init_app(app)
+    password_hasher.init_app(app)
+    user_cache.init_app(app)
+    table_versions.init_app(app)
+    idempotency.init_app(app)
+    init_metrics(app)
+
+    # Routen erst hier importieren: das API-Profil lädt weder WTForms noch die Web-Views
+    import models # Modelle registrieren (user_loader für Flask-Login)
+    from routes_api import api
+    app.register_blueprint(api)
+    if profile == 'web':
+        login.init_app(app)
+        from routes import web
+        app.register_blueprint(web)
+
+    # CLI-Befehle (Massenimport, Archivierung) registrieren
+    from commands import cli
+    app.register_blueprint(cli)
+
+    return app
@@ -0,0 +1,172 @@
+# In-Memory-Verfügbarkeitsindex: pro Auto eine sortierte Intervall-Liste der Buchungen
+import fcntl
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+# Sortierte Buchungsintervalle eines Autos ab dem Zeitpunkt "since"
+class CarIntervals:
+    def __init__(self, since, version, intervals):
+        self.since = since # Ältere Zeiträume sind nicht geladen und müssen in der DB geprüft werden
+        self.version = version # Stand der Invalidierung beim Laden
+        self.intervals = sorted(intervals) # Liste von (start_date, end_date, booking_id)
+        self._rebuild()
+
+    # Startzeiten und laufendes Maximum der Endzeiten für die binäre Suche aufbauen
+    def _rebuild(self):
+        self.starts = [start for start, _, _ in self.intervals]
+        self.max_ends = []
+        current = None
+        for _, end, _ in self.intervals:
+            current = end if current is None or end > current else current
+            self.max_ends.append(current)
+
+    # True/False, falls aus dem Cache beantwortbar; None, falls der Zeitraum vor "since" beginnt
+    def is_free(self, start_date, end_date):
+        if start_date < self.since:
+            return None
+        # Kandidaten sind alle Intervalle, die vor end_date beginnen: O(log n)
+        index = bisect_left(self.starts, end_date)
+        return index == 0 or self.max_ends[index - 1] <= start_date
+
+    def add(self, start_date, end_date, booking_id):
+        insort(self.intervals, (start_date, end_date, booking_id))
+        self._rebuild()
+
+    def remove(self, booking_id):
+        self.intervals = [interval for interval in self.intervals if interval[2] != booking_id]
+        self._rebuild()
+
+# Invalidierung nur innerhalb des eigenen Prozesses (Einzelprozess / Tests)
+class LocalInvalidationBus:
+    def __init__(self):
+        self._versions = {}
+        self._modified = {}
+        self._started = time.time() # Unterscheidet den Zustand "noch nie geändert" zwischen Neustarts
+        self._lock = threading.Lock()
+
+    def version(self, car_id):
+        return self._versions.get(car_id, 0)
+
+    # Zeitpunkt der letzten Änderung (Unix-Zeit)
+    def modified(self, car_id):
+        return self._modified.get(car_id, self._started)
+
+    def bump(self, car_id):
+        with self._lock:
+            old = self._versions.get(car_id, 0)
+            self._versions[car_id] = old + 1
+            self._modified[car_id] = time.time()
+            return old, old + 1
+
+# Prozessübergreifende Invalidierung über eine Versionsdatei pro Auto (z.B. mehrere Gunicorn-Worker)
+class FileInvalidationBus:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, '.lock')
+
+    def _path(self, car_id):
+        return os.path.join(self.directory, str(car_id))
+
+    def version(self, car_id):
+        try:
+            with open(self._path(car_id)) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    # Zeitpunkt der letzten Änderung (Unix-Zeit)
+    def modified(self, car_id):
+        try:
+            return os.stat(self._path(car_id)).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    # Version atomar erhöhen; liefert (alte Version, neue Version)
+    def bump(self, car_id):
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                old = self.version(car_id)
+                tmp_path = '%s.%d.tmp' % (self._path(car_id), os.getpid())
+                with open(tmp_path, 'w') as f:
+                    f.write(str(old + 1))
+                os.replace(tmp_path, self._path(car_id))
+                return old, old + 1
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+# LRU-Cache der Intervall-Listen mit begrenzter Anzahl Autos
+class AvailabilityCache:
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('AVAILABILITY_CACHE_ENABLED', True)
+        self.max_cars = app.config.get('AVAILABILITY_CACHE_MAX_CARS', 1000)
+        self.max_intervals = app.config.get('AVAILABILITY_CACHE_MAX_INTERVALS', 5000)
+        if app.config.get('AVAILABILITY_CACHE_BUS', 'file') == 'local':
+            self.bus = LocalInvalidationBus()
+        else:
+            directory = app.config.get('AVAILABILITY_CACHE_DIR') or os.path.join(app.instance_path, 'availability')
+            self.bus = FileInvalidationBus(directory)
+
+    # Gültigen Eintrag liefern; veraltete Einträge (andere Worker haben geschrieben) werden verworfen
+    def get(self, car_id):
+        with self._lock:
+            entry = self._entries.get(car_id)
+            if entry is None:
+                return None
+            if entry.version != self.bus.version(car_id):
+                del self._entries[car_id]
+                return None
+            self._entries.move_to_end(car_id)
+            return entry
+
+    # Frisch geladene Intervalle übernehmen; zu grosse Listen werden nicht gecacht
+    def put(self, car_id, since, version, intervals):
+        if len(intervals) > self.max_intervals:
+            return None
+        entry = CarIntervals(since, version, intervals)
+        with self._lock:
+            self._entries[car_id] = entry
+            self._entries.move_to_end(car_id)
+            while len(self._entries) > self.max_cars:
+                self._entries.popitem(last=False) # Am längsten nicht genutztes Auto verdrängen
+        return entry
+
+    # Write-Through nach einer Änderung: eigenen Eintrag nachführen und andere Worker invalidieren
+    def _apply(self, car_id, change):
+        old, new = self.bus.bump(car_id)
+        with self._lock:
+            entry = self._entries.get(car_id)
+            if entry is None:
+                return
+            if entry.version != old:
+                del self._entries[car_id] # Zwischenzeitlich hat ein anderer Worker geschrieben
+                return
+            change(entry)
+            entry.version = new
+
+    def booking_added(self, car_id, start_date, end_date, booking_id):
+        self._apply(car_id, lambda entry: entry.add(start_date, end_date, booking_id))
+
+    def booking_removed(self, car_id, booking_id):
+        self._apply(car_id, lambda entry: entry.remove(booking_id))
+
+    # Änderung mit unbekanntem Inhalt (z.B. Stapel-Import): Eintrag verwerfen und neu laden lassen
+    def invalidate(self, car_id):
+        self.bus.bump(car_id)
+        with self._lock:
+            self._entries.pop(car_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,188 @@
+# Server-Sent Events: Änderungen der Verfügbarkeit (neue / stornierte Buchungen) an offene Verbindungen
+# pushen, statt /check_availability wiederholt abzufragen. Die Verteilung an alle Gunicorn-Worker
+# übernimmt ein austauschbarer Broker (im Prozess für Tests, Logdatei für mehrere Worker).
+# Jede offene Verbindung belegt einen Thread des Workers; ihre Anzahl ist pro Worker begrenzt, damit
+# gewöhnliche Requests immer freie Threads vorfinden. Abgewiesene Clients prüfen per Polling.
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+from flask import Response, jsonify
+from json_provider import format_datetime
+
+MAX_STREAM_CARS = 50 # Maximale Anzahl Autos pro Verbindung
+
+# Parameter "car_id" (kommagetrennt) in eine Liste von IDs umwandeln; wirft ValueError
+def parse_car_ids(value):
+    car_ids = list(dict.fromkeys(int(car_id) for car_id in (value or '').split(',') if car_id.strip()))
+    if not car_ids or len(car_ids) > MAX_STREAM_CARS:
+        raise ValueError('Zwischen 1 und %d Autos pro Verbindung' % MAX_STREAM_CARS)
+    return car_ids
+
+# Ereignis aufbauen (Datumswerte im API-Format, kompakt kodiert)
+def make_event(event_type, car_id, start_date=None, end_date=None):
+    event = {'type': event_type, 'car_id': car_id}
+    if start_date is not None:
+        event.update(start_date=format_datetime(start_date), end_date=format_datetime(end_date))
+    return json.dumps(event, separators=(',', ':'))
+
+# Ereignisse nur innerhalb des eigenen Prozesses (Einzelprozess / Tests)
+# Cursor = laufende Nummer des zuletzt gelesenen Ereignisses
+class LocalBroker:
+    def __init__(self, max_events=1000):
+        self._events = deque(maxlen=max_events) # (Nummer, JSON)
+        self._seq = 0
+        self._condition = threading.Condition()
+
+    def publish(self, data):
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, data))
+            self._condition.notify_all()
+
+    def cursor(self):
+        return str(self._seq)
+
+    # Neue Ereignisse nach "cursor" liefern, höchstens "timeout" Sekunden warten.
+    # Liefert (Ereignisse, neuer Cursor, verloren); verloren = Ereignisse sind nicht mehr im Puffer
+    def read(self, cursor, timeout):
+        try:
+            after = int(cursor)
+        except (TypeError, ValueError):
+            after = -1
+        with self._condition:
+            if after > self._seq or after < 0: # Unbekannter Cursor (z.B. nach Neustart)
+                return [], str(self._seq), True
+            self._condition.wait_for(lambda: self._seq > after, timeout)
+            events = [data for seq, data in self._events if seq > after]
+            lost = bool(self._events) and self._events[0][0] > after + 1
+            return events, str(self._seq), lost
+
+# Prozessübergreifende Verteilung über eine Logdatei (eine JSON-Zeile pro Ereignis).
+# Leser prüfen die Dateigrösse im Abstand von "poll_interval"; zu grosse Logs werden rotiert.
+# Cursor = "Inode:Byte-Offset"
+class FileBroker:
+    def __init__(self, directory, poll_interval=0.5, max_bytes=1024 * 1024):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._path = os.path.join(directory, 'events.log')
+        self._lock_path = os.path.join(directory, '.lock')
+
+    def _stat(self):
+        try:
+            st = os.stat(self._path)
+            return st.st_ino, st.st_size
+        except FileNotFoundError:
+            return 0, 0
+
+    def publish(self, data):
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self._stat()[1] > self.max_bytes:
+                    os.replace(self._path, self._path + '.old') # Leser bemerken die neue Inode
+                with open(self._path, 'a') as f:
+                    f.write(data + '\n')
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def cursor(self):
+        return '%d:%d' % self._stat()
+
+    def read(self, cursor, timeout):
+        try:
+            inode, offset = (int(part) for part in cursor.split(':'))
+        except (AttributeError, ValueError):
+            return [], self.cursor(), True
+        lost = False
+        deadline = time.monotonic() + timeout
+        while True:
+            current_inode, size = self._stat()
+            if current_inode != inode or size < offset: # Log wurde rotiert (oder erstmals angelegt)
+                lost = lost or inode != 0
+                inode, offset = current_inode, 0
+            if size > offset or lost or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        if size <= offset:
+            return [], '%d:%d' % (inode, offset), lost
+        with open(self._path, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read(size - offset)
+        # Nur vollständige Zeilen lesen; eine gerade geschriebene Zeile folgt beim nächsten Aufruf
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        events = complete.decode().splitlines()
+        return events, '%d:%d' % (inode, offset + len(complete)), lost
+
+class AvailabilityEvents:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.rejected = 0 # Wegen der Obergrenze abgewiesene Verbindungen (für /metrics)
+        self._rejected_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('AVAILABILITY_EVENTS_ENABLED', True)
+        self.heartbeat = app.config.get('AVAILABILITY_EVENTS_HEARTBEAT', 15) # Sekunden bis zum Keepalive-Kommentar
+        self.max_duration = app.config.get('AVAILABILITY_EVENTS_MAX_DURATION', 300) # Danach verbindet der Client neu
+        self.retry = app.config.get('AVAILABILITY_EVENTS_RETRY', 3) # Wartezeit des Browsers vor dem Neuverbinden
+        self.max_streams = app.config.get('AVAILABILITY_EVENTS_MAX_STREAMS', 4) # Pro Worker; 0 = ohne Obergrenze
+        self.busy_retry_after = app.config.get('AVAILABILITY_EVENTS_BUSY_RETRY_AFTER', 60) # Sekunden bis zum nächsten Versuch
+        self._streams = threading.BoundedSemaphore(self.max_streams) if self.max_streams else None
+        if app.config.get('AVAILABILITY_EVENTS_BROKER', 'file') == 'local':
+            self.broker = LocalBroker()
+        else:
+            directory = app.config.get('AVAILABILITY_EVENTS_DIR') or os.path.join(app.instance_path, 'events')
+            self.broker = FileBroker(directory, app.config.get('AVAILABILITY_EVENTS_POLL_INTERVAL', 0.5))
+
+    def publish(self, event_type, car_id, start_date=None, end_date=None):
+        if self.enabled:
+            self.broker.publish(make_event(event_type, car_id, start_date, end_date))
+
+    # SSE-Antwort für die Autos "car_ids". Mit Last-Event-ID (automatisch beim Neuverbinden des
+    # Browsers) werden verpasste Ereignisse nachgeliefert; sind sie nicht mehr vorhanden, erhält der
+    # Client ein "reset"-Ereignis und muss die Verfügbarkeit einmal neu prüfen.
+    # Der Generator braucht weder App-Kontext noch Datenbankverbindung.
+    # Sind bereits "max_streams" Verbindungen offen, antwortet der Worker mit 503 und Retry-After.
+    def stream(self, car_ids, last_event_id=None):
+        if self._streams is not None and not self._streams.acquire(blocking=False):
+            with self._rejected_lock:
+                self.rejected += 1
+            response = jsonify({'error': 'Zu viele offene Verbindungen, bitte Verfügbarkeit abfragen'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(self.busy_retry_after)
+            return response
+        broker, car_ids = self.broker, set(car_ids)
+        heartbeat, max_duration, retry = self.heartbeat, self.max_duration, self.retry
+
+        def generate():
+            cursor = last_event_id or broker.cursor()
+            yield 'retry: %d\nid: %s\n\n' % (retry * 1000, cursor)
+            deadline = time.monotonic() + max_duration
+            while time.monotonic() < deadline:
+                events, cursor, lost = broker.read(cursor, min(heartbeat, deadline - time.monotonic()))
+                if lost:
+                    yield 'id: %s\nevent: reset\ndata: {}\n\n' % cursor
+                matching = [data for data in events if json.loads(data)['car_id'] in car_ids]
+                for data in matching:
+                    yield 'id: %s\nevent: availability\ndata: %s\n\n' % (cursor, data)
+                if not matching and not lost:
+                    yield ': keepalive\n\n' # Getrennte Clients erkennen, Proxy-Timeouts verhindern
+
+        response = Response(generate(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no' # Kein Puffern in nginx
+        if self._streams is not None:
+            # Der Server schliesst die Antwort immer (auch bei Abbruch durch den Client oder vor dem ersten Lesen)
+            response.call_on_close(self._streams.release)
+        return response
+
+    # Werte für metrics.Metrics.register_collector()
+    def collect_metrics(self):
+        with self._rejected_lock:
+            return [('availability_streams_rejected_total', {}, self.rejected)] if self.rejected else []
@@ -0,0 +1,104 @@
+# Benchmark: Latenz der Konfliktprüfung (booking_service.find_conflict) bei wachsender Buchungstabelle
+#
+# Aufruf:  python benchmarks/bench_conflict_check.py --sizes 10000 100000 1000000 10000000
+# Mit --no-index wird der zusammengesetzte Index entfernt, um den Unterschied zu sehen.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BASEDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASEDIR)
+
+# Eigene SQLite-Datenbank für den Benchmark (muss vor dem Import der App gesetzt sein)
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='bench_conflict_'), 'bench.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+# Keine Versions- und Metrikdateien im instance-Ordner anlegen
+os.environ['AVAILABILITY_CACHE_BUS'] = 'local'
+os.environ['CALENDAR_CACHE_BUS'] = 'local'
+os.environ['AVAILABILITY_EVENTS_BROKER'] = 'local'
+os.environ['TABLE_VERSIONS_BUS'] = 'local'
+os.environ['METRICS_ENABLED'] = '0'
+
+from sqlalchemy import insert, text
+from app import create_app, db
+app = create_app()
+from models import User, Car, Booking
+from booking_service import find_conflict
+
+EPOCH = datetime(2020, 1, 1)
+SLOT = timedelta(hours=3) # Jede Buchung belegt 2 Stunden, danach 1 Stunde Pause
+CHUNK = 50000
+
+# Datenbank neu aufbauen und mit n Buchungen füllen (gleiche Anzahl Buchungen pro Auto)
+def seed(n, per_car, with_index):
+    db.drop_all()
+    db.create_all()
+    if not with_index:
+        db.session.execute(text('DROP INDEX IF EXISTS ix_booking_car_id_start_date_end_date'))
+    db.session.execute(insert(User), [{'username': 'bench', 'email': 'bench@example.com', 'password_hash': '-'}])
+    cars = max(1, n // per_car)
+    for offset in range(0, cars, CHUNK):
+        db.session.execute(insert(Car), [
+            {'model': 'Model', 'brand': 'Brand', 'license_plate': f'BE-{i}', 'available': True}
+            for i in range(offset + 1, min(cars, offset + CHUNK) + 1)
+        ])
+    rows = []
+    for i in range(n):
+        car_id = i % cars + 1
+        start = EPOCH + (i // cars) * SLOT
+        rows.append({'user_id': 1, 'car_id': car_id, 'start_date': start, 'end_date': start + timedelta(hours=2)})
+        if len(rows) == CHUNK:
+            db.session.execute(insert(Booking), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Booking), rows)
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    return cars
+
+# Zufällige Konfliktprüfungen ausführen und Latenzen in Mikrosekunden messen
+def measure(cars, per_car, probes):
+    rnd = random.Random(42)
+    timings = []
+    for _ in range(probes):
+        car_id = rnd.randint(1, cars)
+        start = EPOCH + rnd.randrange(per_car) * SLOT + timedelta(minutes=rnd.choice([0, 150]))
+        t0 = time.perf_counter()
+        find_conflict(car_id, start, start + timedelta(minutes=20))
+        timings.append((time.perf_counter() - t0) * 1e6)
+        db.session.rollback()
+    timings.sort()
+    return {
+        'p50_us': round(statistics.median(timings), 1),
+        'p99_us': round(timings[int(len(timings) * 0.99) - 1], 1),
+        'mean_us': round(statistics.fmean(timings), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Latenz der Konfliktprüfung messen')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--per-car', type=int, default=100)
+    parser.add_argument('--probes', type=int, default=2000)
+    parser.add_argument('--no-index', action='store_true')
+    args = parser.parse_args()
+
+    results = []
+    with app.app_context():
+        for n in args.sizes:
+            t0 = time.perf_counter()
+            cars = seed(n, args.per_car, not args.no_index)
+            seed_s = time.perf_counter() - t0
+            result = {'bookings': n, 'cars': cars, 'index': not args.no_index, 'seed_s': round(seed_s, 1)}
+            result.update(measure(cars, args.per_car, args.probes))
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    os.remove(DB_PATH)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Benchmark: Wirkung der Engine-Profile (engine_profiles.py) unter parallelen Gunicorn-Workern
+#
+# Führt benchmarks/bench_routes.py im Gunicorn-Modus zweimal aus – mit SQLAlchemy-Standardwerten
+# (DB_ENGINE_PROFILE=0) und mit den Profilen (DB_ENGINE_PROFILE=1) – und stellt die Ergebnisse gegenüber.
+#
+# Aufruf:  python benchmarks/bench_engine_profiles.py --workers 4 --concurrency 16
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_ROUTES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_routes.py')
+
+def run(profile, args):
+    env = os.environ.copy()
+    env['DB_ENGINE_PROFILE'] = '1' if profile else '0'
+    with tempfile.NamedTemporaryFile(suffix='.json') as output:
+        subprocess.run([
+            sys.executable, BENCH_ROUTES, '--mode', 'gunicorn', '--output', output.name,
+            '--workers', str(args.workers), '--concurrency', str(args.concurrency),
+            '--requests', str(args.requests), '--bookings', str(args.bookings),
+        ], env=env, check=True, stdout=subprocess.DEVNULL)
+        return json.load(output)['results']['gunicorn']
+
+def main():
+    parser = argparse.ArgumentParser(description='Engine-Profile mit Standardeinstellungen vergleichen')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--bookings', type=int, default=20000)
+    args = parser.parse_args()
+
+    baseline = run(False, args)
+    tuned = run(True, args)
+    comparison = {}
+    for endpoint, before in baseline.items():
+        after = tuned[endpoint]
+        comparison[endpoint] = {
+            key: {'default': before[key], 'profile': after[key]}
+            for key in ('throughput_rps', 'p50_ms', 'p99_ms', 'errors')
+        }
+    print(json.dumps({'workers': args.workers, 'concurrency': args.concurrency, 'results': comparison}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Benchmark: Startkosten (Importe und create_app) der Profile "web" und "api"
+#
+# Startet für jedes Profil mehrere frische Interpreter mit "python -X importtime", misst die Dauer von
+# create_app() und wertet die Importzeiten aus: Summe, Anzahl Module, teuerste Top-Level-Importe und
+# ob schwere Web-Abhängigkeiten (WTForms, Formulare, Web-Views) geladen wurden.
+#
+# Aufruf:  python benchmarks/bench_import_time.py --runs 5 --output importtime.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+BASEDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WEB_ONLY_MODULES = ('wtforms', 'flask_wtf', 'forms', 'routes', 'email_validator')
+
+# Im Kindprozess: Importzeit wird über stderr gemeldet, die Dauer von create_app() über stdout
+STARTUP = '''
+import time
+start = time.perf_counter()
+from app import create_app
+create_app(%r)
+print(time.perf_counter() - start)
+'''
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Importzeit und create_app() pro Profil messen')
+    parser.add_argument('--runs', type=int, default=5, help='Interpreter-Starts pro Profil')
+    parser.add_argument('--top', type=int, default=15, help='Anzahl der teuersten Importe im Bericht')
+    parser.add_argument('--output', default=None, help='JSON-Datei (Standard: stdout)')
+    return parser.parse_args()
+
+# Zeilen "import time: self [us] | cumulative | imported package" auswerten
+def parse_importtime(stderr):
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2 # Einrückung = Verschachtelungstiefe
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+def run_once(profile, workdir):
+    env = os.environ.copy()
+    env.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+        'AVAILABILITY_CACHE_DIR': os.path.join(workdir, 'availability'),
+        'CALENDAR_CACHE_DIR': os.path.join(workdir, 'calendar'),
+        'TABLE_VERSIONS_DIR': os.path.join(workdir, 'table_versions'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    env.setdefault('SECRET_KEY', 'bench-secret')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP % profile],
+                            cwd=BASEDIR, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+def measure(profile, args, workdir):
+    startup, totals, counts = [], [], []
+    modules = None
+    for _ in range(args.runs):
+        seconds, modules = run_once(profile, workdir)
+        startup.append(seconds * 1000)
+        totals.append(sum(self_us for _, self_us, _, _ in modules) / 1000)
+        counts.append(len(modules))
+
+    loaded = {name for name, _, _, _ in modules}
+    top_level = sorted((module for module in modules if module[3] == 0), key=lambda module: -module[2])
+    return {
+        'create_app_ms': {'median': round(statistics.median(startup), 1), 'min': round(min(startup), 1)},
+        'import_ms_total': round(statistics.median(totals), 1),
+        'modules': int(statistics.median(counts)),
+        'top_imports_ms': [[name, round(cumulative_us / 1000, 1)] for name, _, cumulative_us, _ in top_level[:args.top]],
+        'web_modules_loaded': sorted(name for name in WEB_ONLY_MODULES if name in loaded),
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BASEDIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench_import_')
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'profiles': {profile: measure(profile, args, workdir) for profile in ('web', 'api')},
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# Benchmark: Serialisierung einer Buchungsliste (Standard 100'000 Buchungen) als JSON-Antwort
+#
+# Vergleicht die bisherige Variante (strftime pro Datum + Flask-Standardprovider) mit dem FastJSONProvider
+# (json-Modul bzw. orjson, falls installiert) und misst Kodierzeit, Antwortgrösse und gzip-Grösse.
+#
+# Aufruf:  python benchmarks/bench_json.py --bookings 100000 --repeat 5 --output bench_json.json
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+BASEDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASEDIR)
+
+# Keine Datenbank- oder Versionsdateien im instance-Ordner anlegen
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_json_'), 'bench.db')
+os.environ['AVAILABILITY_CACHE_BUS'] = 'local'
+os.environ['CALENDAR_CACHE_BUS'] = 'local'
+os.environ['TABLE_VERSIONS_BUS'] = 'local'
+os.environ['METRICS_ENABLED'] = '0'
+
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from json_provider import FastJSONProvider, booking_to_dict, orjson
+from routes_api import DATE_FORMAT
+
+app = create_app(profile='api')
+
+# Gleiche Attribute wie eine Ergebniszeile aus filtered_booking_rows()
+BookingRow = namedtuple('BookingRow', 'id user_id car_id start_date end_date')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='JSON-Kodierung grosser Buchungslisten messen')
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5, help='Messungen pro Variante (Median wird ausgegeben)')
+    parser.add_argument('--level', type=int, default=6, help='gzip-Stufe')
+    parser.add_argument('--output', default=None, help='JSON-Datei (Standard: stdout)')
+    return parser.parse_args()
+
+def make_rows(n):
+    start = datetime(2030, 1, 1)
+    return [BookingRow(i, i % 500 + 1, i % 2000 + 1, start + timedelta(hours=3 * i), start + timedelta(hours=3 * i + 2))
+            for i in range(1, n + 1)]
+
+# Bisherige Umsetzung aus routes_api.py
+def legacy_to_dict(booking):
+    return {
+        'id': booking.id,
+        'user_id': booking.user_id,
+        'car_id': booking.car_id,
+        'start_date': booking.start_date.strftime(DATE_FORMAT),
+        'end_date': booking.end_date.strftime(DATE_FORMAT)
+    }
+
+def measure(provider, to_dict, rows, repeat, level):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        response = provider.response([to_dict(row) for row in rows])
+        timings.append(time.perf_counter() - t0)
+    data = response.get_data()
+    t0 = time.perf_counter()
+    compressed = gzip.compress(data, level, mtime=0)
+    gzip_ms = (time.perf_counter() - t0) * 1000
+    return {
+        'encode_ms': round(statistics.median(timings) * 1000, 1),
+        'bytes': len(data),
+        'gzip_bytes': len(compressed),
+        'gzip_ms': round(gzip_ms, 1),
+    }, data
+
+def main():
+    args = parse_args()
+    rows = make_rows(args.bookings)
+    variants = [('legacy', DefaultJSONProvider(app), legacy_to_dict)]
+    for encoder in ('json', 'orjson'):
+        if encoder == 'orjson' and orjson is None:
+            continue
+        app.config['JSON_ENCODER'] = encoder
+        variants.append((encoder, FastJSONProvider(app), booking_to_dict))
+
+    results = {'bookings': args.bookings, 'gzip_level': args.level, 'variants': {}}
+    reference = None
+    with app.app_context():
+        for name, provider, to_dict in variants:
+            result, data = measure(provider, to_dict, rows, args.repeat, args.level)
+            # Alle Varianten müssen denselben Inhalt liefern
+            decoded = json.loads(data)
+            if reference is None:
+                reference = decoded
+            result['same_content'] = decoded == reference
+            results['variants'][name] = result
+            print('%-7s %8.1f ms  %10d B  gzip %9d B (%.1f ms)' % (name, result['encode_ms'], result['bytes'],
+                  result['gzip_bytes'], result['gzip_ms']), file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# Benchmark: parallele Buchungen mehrerer Prozesse auf wenige Autos (Sperrkonflikte)
+#
+# Prüft nach jedem Lauf, dass keine überschneidenden Buchungen entstanden sind, und misst den
+# Durchsatz in Abhängigkeit von der Anzahl gleichzeitiger Schreiber.
+#
+# Aufruf:  python benchmarks/bench_reservation_contention.py --writers 1 2 4 8
+#          python benchmarks/bench_reservation_contention.py --database-url postgresql://...
+#          python benchmarks/bench_reservation_contention.py --unsafe   (alte Prüfung ohne Sperre)
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BASEDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASEDIR)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Parallele Reservierungen messen')
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--attempts', type=int, default=200, help='Buchungsversuche pro Schreiber')
+    parser.add_argument('--cars', type=int, default=3)
+    parser.add_argument('--slots', type=int, default=200, help='Anzahl Stunden-Slots pro Auto')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--unsafe', action='store_true', help='Prüfen und Einfügen ohne Sperre')
+    return parser.parse_args()
+
+ARGS = parse_args()
+if ARGS.database_url:
+    os.environ['DATABASE_URL'] = ARGS.database_url
+else:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_reserve_'), 'bench.db')
+# Keine Versions- und Metrikdateien im instance-Ordner anlegen
+os.environ['AVAILABILITY_CACHE_BUS'] = 'local'
+os.environ['CALENDAR_CACHE_BUS'] = 'local'
+os.environ['AVAILABILITY_EVENTS_BROKER'] = 'local'
+os.environ['TABLE_VERSIONS_BUS'] = 'local'
+os.environ['METRICS_ENABLED'] = '0'
+
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from app import create_app, db
+app = create_app()
+from models import User, Car, Booking
+from booking_service import reserve, find_conflict, BookingConflict
+
+EPOCH = datetime(2030, 1, 1)
+
+# Datenbank leeren und mit einem Benutzer und einigen Autos füllen
+def reset():
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='bench', email='bench@example.com', password_hash='-'))
+    for i in range(ARGS.cars):
+        db.session.add(Car(model='Model', brand='Brand', license_plate=f'BE-{i}'))
+    db.session.commit()
+
+# Buchung wie vor der Reservierungs-Engine: prüfen und einfügen ohne Sperre
+def unsafe_reserve(user_id, car_id, start_date, end_date):
+    if find_conflict(car_id, start_date, end_date) is not None:
+        raise BookingConflict(car_id)
+    db.session.add(Booking(user_id=user_id, car_id=car_id, start_date=start_date, end_date=end_date))
+    db.session.commit()
+
+# Ein Schreiber-Prozess: zufällige Zeiträume auf zufälligen Autos buchen
+def writer(seed, start_event, queue):
+    with app.app_context():
+        db.engine.dispose(close=False) # Verbindungen des Elternprozesses nicht weiterverwenden
+        rnd = random.Random(seed)
+        book = unsafe_reserve if ARGS.unsafe else reserve
+        counts = {'created': 0, 'conflict': 0, 'error': 0}
+        start_event.wait()
+        for _ in range(ARGS.attempts):
+            start = EPOCH + timedelta(hours=rnd.randrange(ARGS.slots))
+            try:
+                book(1, rnd.randint(1, ARGS.cars), start, start + timedelta(hours=rnd.randint(1, 3)))
+                counts['created'] += 1
+            except BookingConflict:
+                counts['conflict'] += 1
+            except Exception:
+                db.session.rollback()
+                counts['error'] += 1
+        queue.put(counts)
+
+# Anzahl Paare von Buchungen desselben Autos, die sich überschneiden
+def count_double_bookings():
+    other = aliased(Booking)
+    return db.session.query(func.count()).select_from(Booking).join(other, db.and_(
+        other.car_id == Booking.car_id,
+        other.id > Booking.id,
+        other.start_date < Booking.end_date,
+        other.end_date > Booking.start_date,
+    )).scalar()
+
+def run(writers):
+    with app.app_context():
+        reset()
+        db.engine.dispose()
+    ctx = multiprocessing.get_context('fork')
+    start_event, queue = ctx.Event(), ctx.Queue()
+    processes = [ctx.Process(target=writer, args=(seed, start_event, queue)) for seed in range(writers)]
+    for process in processes:
+        process.start()
+    t0 = time.perf_counter()
+    start_event.set()
+    totals = {'created': 0, 'conflict': 0, 'error': 0}
+    for _ in processes:
+        for key, value in queue.get().items():
+            totals[key] += value
+    elapsed = time.perf_counter() - t0
+    for process in processes:
+        process.join()
+    with app.app_context():
+        double_bookings = count_double_bookings()
+    attempts = writers * ARGS.attempts
+    return dict(writers=writers, mode='unsafe' if ARGS.unsafe else 'reserve', attempts=attempts,
+                attempts_per_s=round(attempts / elapsed, 1), double_bookings=double_bookings, **totals)
+
+def main():
+    for writers in ARGS.writers:
+        print(json.dumps(run(writers)), flush=True)
+
+if __name__ == '__main__':
+    main()
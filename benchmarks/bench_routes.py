@@ -0,0 +1,317 @@
+# Last- und Latenz-Benchmark für die wichtigsten Routen
+#
+# Baut eine SQLite-Datenbank mit konfigurierbarer Anzahl Benutzer, Autos und Buchungen auf und ruft die
+# Routen über den Flask-Testclient und/oder einen lokalen Gunicorn mit mehreren Workern auf.
+# Das Ergebnis (Durchsatz, p50/p95/p99 pro Endpunkt) wird als JSON ausgegeben und kann zwischen
+# Commits verglichen werden.
+#
+# Aufruf:  python benchmarks/bench_routes.py --mode both --requests 500 --output bench.json
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BASEDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASEDIR)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Latenz und Durchsatz der Routen messen')
+    parser.add_argument('--mode', choices=['testclient', 'gunicorn', 'both'], default='testclient')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--cars', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=300, help='Anfragen pro Endpunkt')
+    parser.add_argument('--workers', type=int, default=4, help='Gunicorn-Worker')
+    parser.add_argument('--concurrency', type=int, default=8, help='Parallele Clients im Gunicorn-Modus')
+    parser.add_argument('--output', default=None, help='JSON-Datei (Standard: stdout)')
+    return parser.parse_args()
+
+ARGS = parse_args()
+WORKDIR = tempfile.mkdtemp(prefix='bench_routes_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+os.environ['AVAILABILITY_CACHE_DIR'] = os.path.join(WORKDIR, 'availability')
+os.environ['CALENDAR_CACHE_DIR'] = os.path.join(WORKDIR, 'calendar')
+os.environ['TABLE_VERSIONS_DIR'] = os.path.join(WORKDIR, 'table_versions')
+os.environ['METRICS_DIR'] = os.path.join(WORKDIR, 'metrics')
+os.environ['AVAILABILITY_EVENTS_DIR'] = os.path.join(WORKDIR, 'events')
+os.environ['ADMISSION_DIR'] = os.path.join(WORKDIR, 'admission')
+os.environ['IDEMPOTENCY_DIR'] = os.path.join(WORKDIR, 'idempotency')
+# Der Lastgenerator ist ein einzelner Client: Rate-Limits würden die Messung verfälschen
+os.environ.setdefault('ADMISSION_ENABLED', '0')
+
+from sqlalchemy import insert
+from app import create_app, db, password_hasher
+app = create_app()
+from models import User, Car, Booking
+
+PASSWORD = 'bench-password'
+NOW = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+# Datenbank mit Testdaten füllen (alle Benutzer teilen sich einen Passwort-Hash)
+def seed():
+    with app.app_context():
+        db.create_all()
+        password_hash = password_hasher.hash(PASSWORD)
+        db.session.execute(insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password_hash}
+            for i in range(1, ARGS.users + 1)
+        ])
+        db.session.execute(insert(Car), [
+            {'model': 'Model', 'brand': f'Brand{i % 10}', 'license_plate': f'BE-{i}', 'available': True}
+            for i in range(1, ARGS.cars + 1)
+        ])
+        rows = []
+        for i in range(ARGS.bookings):
+            start = NOW + timedelta(hours=3 * (i // ARGS.cars))
+            rows.append({'user_id': i % ARGS.users + 1, 'car_id': i % ARGS.cars + 1,
+                         'start_date': start, 'end_date': start + timedelta(hours=2)})
+            if len(rows) == 10000:
+                db.session.execute(insert(Booking), rows)
+                rows = []
+        if rows:
+            db.session.execute(insert(Booking), rows)
+        db.session.commit()
+
+# Client über den Flask-Testclient (gleicher Prozess, ohne Netzwerk)
+class TestClientDriver:
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None, headers=None):
+        response = self.client.open(path, method=method, json=json_body, data=form, headers=headers or {})
+        return response.status_code, response.get_data()
+
+# HTTP-Client gegen einen laufenden Server (eigene Cookies pro Client)
+class HttpDriver:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+
+    def request(self, method, path, json_body=None, form=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            body = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(req) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+# Weiterleitungen nicht folgen, damit nur die gemessene Route zählt
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+# Sitzung eines simulierten Benutzers: Web-Login (mit CSRF-Token) und JWT
+class Session:
+    def __init__(self, driver, user_number):
+        self.driver = driver
+        self.username = f'user{user_number}'
+        self.user_id = user_number
+        self.rnd = random.Random(user_number)
+        self.token = None
+        self._csrf_token = None
+
+    # CSRF-Token einmal pro Sitzung holen (bleibt für die ganze Sitzung gültig)
+    def csrf_token(self):
+        if self._csrf_token is None:
+            _, body = self.driver.request('GET', '/login')
+            match = re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"', body)
+            self._csrf_token = match.group(1).decode() if match else ''
+        return self._csrf_token
+
+    def web_login(self):
+        form = {'username': self.username, 'password': PASSWORD, 'csrf_token': self.csrf_token()}
+        return self.driver.request('POST', '/login', form=form)
+
+    def api_login(self):
+        status, body = self.driver.request('POST', '/api/login', json_body={'username': self.username, 'password': PASSWORD})
+        if status == 200:
+            self.token = json.loads(body)['access_token']
+        return status, body
+
+    def auth(self):
+        return {'Authorization': 'Bearer ' + self.token}
+
+    def random_window(self, fmt):
+        start = NOW + timedelta(hours=self.rnd.randrange(24 * 365))
+        return start.strftime(fmt), (start + timedelta(hours=2)).strftime(fmt)
+
+# Ein Szenario führt genau eine gemessene Anfrage aus und liefert den Statuscode
+def scenario_web_login(session, state):
+    return session.web_login()[0]
+
+def scenario_bookings_page(session, state):
+    return session.driver.request('GET', '/bookings')[0]
+
+def scenario_check_availability(session, state):
+    start, end = session.random_window('%Y-%m-%dT%H:%M')
+    body = {'car_id': session.rnd.randint(1, ARGS.cars), 'start_date': start, 'end_date': end}
+    return session.driver.request('POST', '/check_availability', json_body=body)[0]
+
+def scenario_api_login(session, state):
+    return session.api_login()[0]
+
+def scenario_api_list(session, state):
+    return session.driver.request('GET', '/api/bookings?limit=100', headers=session.auth())[0]
+
+def scenario_api_create(session, state):
+    start, end = session.random_window('%Y-%m-%d %H:%M')
+    body = {'car_id': session.rnd.randint(1, ARGS.cars), 'start_date': start, 'end_date': end}
+    status, response = session.driver.request('POST', '/api/bookings', json_body=body, headers=session.auth())
+    if status == 201:
+        state.setdefault('created', []).append(json.loads(response)['booking_id'])
+    return status
+
+def scenario_api_delete(session, state):
+    created = state.get('created')
+    if not created:
+        return 0
+    return session.driver.request('DELETE', '/api/bookings/%d' % created.pop(), headers=session.auth())[0]
+
+# Reihenfolge ist wichtig: DELETE löscht die zuvor per POST angelegten Buchungen
+SCENARIOS = [
+    ('POST /login', scenario_web_login),
+    ('GET /bookings', scenario_bookings_page),
+    ('POST /check_availability', scenario_check_availability),
+    ('POST /api/login', scenario_api_login),
+    ('GET /api/bookings', scenario_api_list),
+    ('POST /api/bookings', scenario_api_create),
+    ('DELETE /api/bookings/<id>', scenario_api_delete),
+]
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return round(sorted_values[index] * 1000, 3)
+
+def summarize(timings, statuses, elapsed):
+    timings.sort()
+    counts = {}
+    for status in statuses:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+    return {
+        'requests': len(timings),
+        'errors': sum(1 for status in statuses if status == 0 or status >= 500),
+        'status': counts,
+        'throughput_rps': round(len(timings) / elapsed, 1) if elapsed else None,
+        'p50_ms': percentile(timings, 0.50),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+    }
+
+# Alle Szenarien mit "concurrency" parallelen Sitzungen ausführen
+def run_scenarios(make_driver, concurrency):
+    sessions = []
+    for i in range(concurrency):
+        session = Session(make_driver(), i % ARGS.users + 1)
+        session.web_login()
+        session.api_login()
+        sessions.append(session)
+    states = [{} for _ in sessions]
+    results = {}
+    for name, scenario in SCENARIOS:
+        timings, statuses = [], []
+        lock = threading.Lock()
+
+        def worker(index):
+            session, state = sessions[index], states[index]
+            share = ARGS.requests // concurrency + (1 if index < ARGS.requests % concurrency else 0)
+            for _ in range(share):
+                t0 = time.perf_counter()
+                status = scenario(session, state)
+                duration = time.perf_counter() - t0
+                with lock:
+                    timings.append(duration)
+                    statuses.append(status)
+
+        t0 = time.perf_counter()
+        if concurrency == 1:
+            worker(0)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(worker, range(concurrency)))
+        results[name] = summarize(timings, statuses, time.perf_counter() - t0)
+    return results
+
+def run_testclient():
+    app.config['QUERY_STATS_HEADERS'] = False
+    return run_scenarios(TestClientDriver, 1)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_gunicorn():
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(ARGS.workers), '-b', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'app:create_app()'],
+        cwd=BASEDIR, env=os.environ.copy())
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.time() > deadline or process.poll() is not None:
+                    raise RuntimeError('Gunicorn konnte nicht gestartet werden')
+                time.sleep(0.2)
+        return run_scenarios(lambda: HttpDriver(f'http://127.0.0.1:{port}'), ARGS.concurrency)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BASEDIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    t0 = time.perf_counter()
+    seed()
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {key: getattr(ARGS, key) for key in ('users', 'cars', 'bookings', 'requests', 'workers', 'concurrency')},
+        'seed_s': round(time.perf_counter() - t0, 2),
+        'results': {},
+    }
+    if ARGS.mode in ('testclient', 'both'):
+        report['results']['testclient'] = run_testclient()
+    if ARGS.mode in ('gunicorn', 'both'):
+        report['results']['gunicorn'] = run_gunicorn()
+
+    output = json.dumps(report, indent=2)
+    if ARGS.output:
+        with open(ARGS.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
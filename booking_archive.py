@@ -0,0 +1,54 @@
+# Hot/Cold-Split: abgeschlossene Buchungen werden blockweise aus "booking" nach "booking_archive" verschoben.
+# Konfliktprüfungen und Verfügbarkeitsabfragen lesen nur die (kleine) Live-Tabelle; Auswertungen und die
+# Buchungsliste der API beziehen das Archiv nur ein, wenn der angefragte Zeitraum es erfordert.
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, insert, delete, func, literal, union_all
+from app import db, table_versions
+from models import Booking, BookingArchive
+from replica_routing import use_primary
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'car_id', 'start_date', 'end_date')
+
+# Spätestes Enddatum im Archiv (None, solange das Archiv leer ist); wird pro Tabellenversion einmal
+# von der Primärdatenbank abgefragt (ein Replikat könnte einen veralteten Wert für die neue Version liefern).
+# Gespeichert als (Version der Archivtabelle, spätestes end_date) pro Anwendung in app.extensions.
+def archive_horizon():
+    version = table_versions.version('booking_archive') # Vor der Abfrage lesen, damit parallele Änderungen erkannt werden
+    horizon = current_app.extensions.get('archive_horizon', (None, None))
+    if horizon[0] != version:
+        with use_primary():
+            horizon = (version, db.session.query(func.max(BookingArchive.end_date)).scalar())
+        current_app.extensions['archive_horizon'] = horizon
+    return horizon[1]
+
+# Können archivierte Buchungen enden, nachdem "ended_after" (None = beliebig früh) vorbei ist?
+def includes_archive(ended_after=None):
+    horizon = archive_horizon()
+    return horizon is not None and (ended_after is None or horizon > ended_after)
+
+# Buchungszeilen (id, user_id, car_id, start_date, end_date) aus Live-Tabelle und bei Bedarf Archiv
+# als Subquery; die Filter werden je Tabelle übergeben (z.B. booking_filters(args, BookingArchive))
+def booking_rows(live_filters, archive_filters, ended_after=None):
+    stmt = select(*[getattr(Booking, column) for column in ARCHIVE_COLUMNS]).where(*live_filters)
+    if includes_archive(ended_after):
+        stmt = union_all(stmt, select(*[getattr(BookingArchive, column) for column in ARCHIVE_COLUMNS])
+                         .where(*archive_filters))
+    return stmt.subquery()
+
+# Einen Block abgeschlossener Buchungen (end_date <= cutoff) verschieben; liefert die Anzahl verschobener Zeilen.
+# Ohne Commit – der Aufrufer führt den Block als eigene Transaktion aus (booking_service.run_with_retry).
+# IDs werden nie wiederverwendet (AUTOINCREMENT bzw. Sequenz), archivierte IDs bleiben eindeutig.
+def archive_batch(cutoff, batch_size):
+    ids = [booking_id for (booking_id,) in db.session.query(Booking.id).filter(
+        Booking.end_date <= cutoff
+    ).order_by(Booking.id).limit(batch_size).with_for_update()]
+    if not ids:
+        return 0
+    columns = [getattr(Booking, column) for column in ARCHIVE_COLUMNS]
+    db.session.execute(insert(BookingArchive).from_select(
+        ARCHIVE_COLUMNS + ('archived_at',),
+        select(*columns, literal(datetime.now(), BookingArchive.archived_at.type)).where(Booking.id.in_(ids))
+    ))
+    db.session.execute(delete(Booking).where(Booking.id.in_(ids)).execution_options(synchronize_session=False))
+    return len(ids)
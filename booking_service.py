@@ -0,0 +1,232 @@
+# Zentraler Dienst für die Konfliktprüfung von Buchungen (Intervall-Überlappung)
+import random
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_, exists, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app import db, availability_cache, slot_calendar, availability_events
+from models import Booking, BookingArchive, Car
+from booking_archive import includes_archive
+from slot_calendar import MonthSlots, month_bounds
+from replica_routing import use_primary
+
+BATCH_CONFLICT = 'batch' # Konflikt mit einem früheren Eintrag desselben Stapels
+BOOKED_CONFLICT = 'booked' # Konflikt mit einer bestehenden Buchung
+CHECK_BATCH_CARS = 500 # Autos pro Abfrage in check_batch()
+
+# Fehler beim Reservieren (werden von den Routen in Fehlermeldungen übersetzt)
+class ReservationError(Exception):
+    pass
+
+class CarNotFound(ReservationError):
+    pass
+
+class BookingConflict(ReservationError):
+    pass
+
+# Filterbedingungen für Buchungen, die sich mit dem Zeitraum [start_date, end_date) überschneiden.
+# Die Reihenfolge entspricht dem zusammengesetzten Index (car_id, start_date, end_date).
+def overlap_filter(car_id, start_date, end_date, model=Booking):
+    return (
+        model.car_id == car_id,
+        model.start_date < end_date,
+        model.end_date > start_date,
+    )
+
+# Tabellen, die Buchungen im Zeitraum ab "start_date" enthalten können: das Archiv nur, wenn der
+# Zeitraum vor den Archiv-Horizont zurückreicht (siehe booking_archive.py)
+def booking_models(start_date):
+    return (Booking, BookingArchive) if includes_archive(start_date) else (Booking,)
+
+# Abfrage aller freigegebenen Autos ohne Buchung im Zeitraum (Anti-Join über NOT EXISTS)
+def free_cars_query(start_date, end_date):
+    query = Car.query.filter(Car.available.is_(True))
+    for model in booking_models(start_date):
+        query = query.filter(~exists().where(and_(
+            model.car_id == Car.id,
+            model.start_date < end_date,
+            model.end_date > start_date,
+        )))
+    return query
+
+# Liefert die erste überschneidende Buchung (bzw. archivierte Buchung) oder None, falls das Auto frei ist.
+# locking=True (Schreibpfade nach lock_cars): sperrende Abfrage, die immer den neuesten Stand liest. Unter
+# REPEATABLE READ (MySQL/InnoDB) sähe eine normale Abfrage den Snapshot der ersten Abfrage der Transaktion,
+# also evtl. einen Stand vor der Sperre.
+def find_conflict(car_id, start_date, end_date, exclude_id=None, locking=False):
+    for model in booking_models(start_date):
+        query = model.query.filter(*overlap_filter(car_id, start_date, end_date, model))
+        if exclude_id is not None:
+            query = query.filter(model.id != exclude_id) # Eigene Buchung (z.B. bei Änderungen) ignorieren
+        if locking:
+            query = query.with_for_update()
+        conflict = query.first()
+        if conflict is not None:
+            return conflict
+    return None
+
+# Prüft, ob ein Auto im gewählten Zeitraum verfügbar ist (nur lesend, z.B. für Verfügbarkeitsabfragen).
+# Wird wenn möglich aus dem Verfügbarkeits-Cache beantwortet; Schreibpfade prüfen immer mit find_conflict().
+def is_available(car_id, start_date, end_date):
+    if availability_cache.enabled:
+        entry = availability_cache.get(car_id) or _load_car_intervals(car_id)
+        answer = entry.is_free(start_date, end_date) if entry is not None else None
+        if answer is not None:
+            return answer
+    return find_conflict(car_id, start_date, end_date) is None
+
+# Laufende und zukünftige Buchungen eines Autos in den Cache laden. Immer von der Primärdatenbank:
+# Der Eintrag gilt bis zur nächsten Version, ein nachhängendes Replikat würde veraltete Intervalle festschreiben.
+def _load_car_intervals(car_id):
+    version = availability_cache.bus.version(car_id) # Vor dem Laden lesen, damit parallele Änderungen erkannt werden
+    since = datetime.now()
+    with use_primary():
+        rows = db.session.query(Booking.start_date, Booking.end_date, Booking.id).filter(
+            Booking.car_id == car_id, Booking.end_date > since
+        ).limit(availability_cache.max_intervals + 1).all()
+    return availability_cache.put(car_id, since, version, [tuple(row) for row in rows])
+
+# Nach dem Speichern einer Buchung aufrufen (hält die Caches aktuell)
+def booking_created(booking):
+    if availability_cache.enabled:
+        availability_cache.booking_added(booking.car_id, booking.start_date, booking.end_date, booking.id)
+    if slot_calendar.enabled:
+        slot_calendar.booking_added(booking.car_id, booking.start_date, booking.end_date)
+    availability_events.publish('booking_added', booking.car_id, booking.start_date, booking.end_date)
+
+# Nach dem Löschen einer Buchung aufrufen
+def booking_deleted(booking):
+    if availability_cache.enabled:
+        availability_cache.booking_removed(booking.car_id, booking.id)
+    if slot_calendar.enabled:
+        slot_calendar.booking_removed(booking.car_id, booking.start_date, booking.end_date)
+    availability_events.publish('booking_removed', booking.car_id, booking.start_date, booking.end_date)
+
+# Monatskalender (MonthSlots) für mehrere Autos; fehlende Monate werden mit einer Abfrage geladen
+def month_slots(car_ids, month_start):
+    month_start, month_end = month_bounds(month_start)
+    result = {}
+    if slot_calendar.enabled:
+        for car_id in car_ids:
+            entry = slot_calendar.get(car_id, month_start)
+            if entry is not None:
+                result[car_id] = entry
+    missing = [car_id for car_id in car_ids if car_id not in result]
+    if not missing:
+        return result
+
+    # Versionen vor dem Laden lesen, damit parallele Änderungen erkannt werden
+    for car_id in missing:
+        result[car_id] = MonthSlots(month_start, slot_calendar.bus.version(car_id) if slot_calendar.enabled else None)
+    # Zu cachende Monate von der Primärdatenbank laden (wie _load_car_intervals); ohne Cache darf ein Replikat antworten
+    with use_primary() if slot_calendar.enabled else nullcontext():
+        for model in booking_models(month_start):
+            rows = db.session.query(model.car_id, model.start_date, model.end_date).filter(
+                model.car_id.in_(missing), model.start_date < month_end, model.end_date > month_start
+            )
+            for car_id, start_date, end_date in rows:
+                result[car_id].add(start_date, end_date)
+    if slot_calendar.enabled:
+        for car_id in missing:
+            slot_calendar.put(car_id, result[car_id])
+    return result
+
+# Zwei halboffene Intervalle [start, end) überschneiden sich
+def _overlaps(start_a, end_a, start_b, end_b):
+    return start_a < end_b and end_a > start_b
+
+# Prüft einen Stapel von Buchungswünschen (car_id, start_date, end_date) mit einer einzigen Abfrage.
+# Rückgabe: Liste mit None (frei), BATCH_CONFLICT oder BOOKED_CONFLICT pro Eintrag.
+# Innerhalb des Stapels gewinnt jeweils der frühere Eintrag.
+# Nur für Schreibpfade nach lock_cars(): liest wie find_conflict(locking=True) mit sperrenden Abfragen.
+def check_batch(items):
+    if not items:
+        return []
+
+    # Pro Auto den insgesamt betroffenen Zeitraum bestimmen
+    bounds = {}
+    for car_id, start_date, end_date in items:
+        low, high = bounds.get(car_id, (start_date, end_date))
+        bounds[car_id] = (min(low, start_date), max(high, end_date))
+
+    # Alle bestehenden Buchungen in diesen Zeiträumen mit einer Abfrage pro CHECK_BATCH_CARS Autos laden
+    # (SQLite begrenzt die Tiefe verschachtelter OR-Ausdrücke)
+    existing = {}
+    car_bounds = list(bounds.items())
+    for model in booking_models(min(low for low, _ in bounds.values())):
+        for offset in range(0, len(car_bounds), CHECK_BATCH_CARS):
+            rows = db.session.query(model.car_id, model.start_date, model.end_date).filter(or_(*[
+                and_(*overlap_filter(car_id, low, high, model))
+                for car_id, (low, high) in car_bounds[offset:offset + CHECK_BATCH_CARS]
+            ])).with_for_update().all()
+            for car_id, start_date, end_date in rows:
+                existing.setdefault(car_id, []).append((start_date, end_date))
+
+    results = []
+    accepted = {}
+    for car_id, start_date, end_date in items:
+        if any(_overlaps(start_date, end_date, s, e) for s, e in existing.get(car_id, ())):
+            results.append(BOOKED_CONFLICT)
+        elif any(_overlaps(start_date, end_date, s, e) for s, e in accepted.get(car_id, ())):
+            results.append(BATCH_CONFLICT)
+        else:
+            accepted.setdefault(car_id, []).append((start_date, end_date))
+            results.append(None)
+    return results
+
+# Sperrt die Zeilen der angegebenen Autos bis zum Ende der Transaktion (immer in aufsteigender
+# Reihenfolge, damit sich parallele Transaktionen nicht gegenseitig blockieren).
+# Liefert die IDs der gefundenen Autos.
+def lock_cars(car_ids):
+    car_ids = sorted(set(car_ids))
+    if not car_ids:
+        return set()
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # SQLite kennt kein SELECT ... FOR UPDATE: ein leeres UPDATE holt die Schreibsperre der Datenbank
+        # vor dem Lesen, sodass die anschliessende Konfliktprüfung den neuesten Stand sieht
+        db.session.execute(update(Car).where(Car.id.in_(car_ids)).values(id=Car.id))
+        return {car_id for (car_id,) in db.session.query(Car.id).filter(Car.id.in_(car_ids))}
+    rows = db.session.query(Car.id).filter(Car.id.in_(car_ids)).order_by(Car.id).with_for_update().all()
+    return {car_id for (car_id,) in rows}
+
+# Führt eine Schreibtransaktion aus und wiederholt sie bei Sperrkonflikten (Deadlock, "database is locked")
+def run_with_retry(work):
+    attempts = current_app.config.get('RESERVATION_MAX_ATTEMPTS', 5)
+    backoff = current_app.config.get('RESERVATION_RETRY_BACKOFF', 0.01)
+    for attempt in range(1, attempts + 1):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError:
+            db.session.rollback()
+            if attempt == attempts:
+                raise
+            time.sleep(backoff * attempt * (1 + random.random())) # Zufälliger Abstand gegen erneute Kollisionen
+
+# Bucht ein Auto atomar: Autozeile sperren, Überschneidung prüfen, Buchung speichern.
+# Wirft CarNotFound bzw. BookingConflict; liefert sonst die gespeicherte Buchung.
+def reserve(user_id, car_id, start_date, end_date):
+    def work():
+        if car_id not in lock_cars([car_id]):
+            raise CarNotFound(car_id)
+        if find_conflict(car_id, start_date, end_date, locking=True) is not None:
+            raise BookingConflict(car_id)
+        booking = Booking(user_id=user_id, car_id=car_id, start_date=start_date, end_date=end_date)
+        db.session.add(booking)
+        db.session.flush()
+        return booking
+
+    try:
+        booking = run_with_retry(work)
+    except ReservationError:
+        db.session.rollback()
+        raise
+    except IntegrityError:
+        # Ausschluss-Constraint der Datenbank (PostgreSQL) hat die Überschneidung erkannt
+        db.session.rollback()
+        raise BookingConflict(car_id)
+    booking_created(booking)
+    return booking
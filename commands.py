@@ -0,0 +1,215 @@
+# Flask-CLI-Befehle für den Massenimport von Autos und Buchungen (CSV oder NDJSON)
+#
+#   flask --app app import-cars autos.csv --batch-size 1000
+#   flask --app app import-bookings buchungen.ndjson --rejects abgelehnt.ndjson
+#   flask --app app archive-bookings --before "2025-01-01 00:00"
+import csv
+import json
+import sqlite3
+import time
+from datetime import datetime
+import click
+from flask import Blueprint
+from sqlalchemy import insert
+from app import db, availability_cache, slot_calendar, availability_events, metrics
+from models import Car, Booking, User
+from booking_service import check_batch, lock_cars, run_with_retry
+from booking_archive import archive_batch
+from replica_routing import REPLICA_PREFIX
+
+# Befehle ohne eigene Gruppe direkt unter "flask" registrieren (siehe app.create_app)
+cli = Blueprint('commands', __name__, cli_group=None)
+
+# Zeilen einer CSV- oder NDJSON-Datei einzeln lesen (Format anhand der Dateiendung oder --format).
+# Ungültige NDJSON-Zeilen werden mit Zeilennummer im Bericht abgelehnt, der Import läuft weiter.
+def read_rows(file, file_format, report):
+    if file_format == 'ndjson' or (file_format is None and file.name.endswith(('.ndjson', '.jsonl'))):
+        for line_no, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                report.reject(line.rstrip('\n'), 'Ungültiges JSON in Zeile %d' % line_no)
+                continue
+            if isinstance(row, dict):
+                yield row
+            else:
+                report.reject(row, 'Zeile %d ist kein JSON-Objekt' % line_no)
+    else:
+        yield from csv.DictReader(file)
+
+# Zeilen in Blöcke fester Grösse zusammenfassen, damit der Speicherbedarf konstant bleibt
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ('0', 'false', 'no', 'nein', '')
+
+def parse_date(value):
+    return datetime.fromisoformat(str(value).strip()) # z.B. "2025-03-19 14:30" oder "2025-03-19T14:30"
+
+# Fortschritt und Abschlussmeldung mit Zeilen pro Sekunde
+class ImportReport:
+    def __init__(self, rejects_file):
+        self.started = time.perf_counter()
+        self.inserted = 0
+        self.rejected = 0
+        self.rejects_file = rejects_file
+
+    def reject(self, row, reason):
+        self.rejected += 1
+        if self.rejects_file is not None:
+            self.rejects_file.write(json.dumps({'row': row, 'error': reason}, default=str) + '\n')
+
+    def progress(self):
+        elapsed = time.perf_counter() - self.started
+        rate = (self.inserted + self.rejected) / elapsed if elapsed else 0
+        return '%d importiert, %d abgelehnt, %.0f Zeilen/s' % (self.inserted, self.rejected, rate)
+
+import_options = [
+    click.argument('file', type=click.File('r', encoding='utf-8')),
+    click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default=None),
+    click.option('--batch-size', default=1000, show_default=True, help='Zeilen pro Block und INSERT'),
+    click.option('--rejects', type=click.File('w', encoding='utf-8'), default=None,
+                 help='Abgelehnte Zeilen als NDJSON in diese Datei schreiben'),
+]
+
+def with_import_options(command):
+    for option in reversed(import_options):
+        command = option(command)
+    return command
+
+@cli.cli.command('import-cars')
+@with_import_options
+def import_cars(file, file_format, batch_size, rejects):
+    """Autos (model, brand, license_plate, available) blockweise importieren."""
+    report = ImportReport(rejects)
+    for chunk in chunked(read_rows(file, file_format, report), batch_size):
+        rows = []
+        plates = set()
+        for row in chunk:
+            plate = (row.get('license_plate') or '').strip()
+            if not plate:
+                report.reject(row, 'Kennzeichen fehlt')
+            elif plate in plates:
+                report.reject(row, 'Kennzeichen mehrfach in der Datei')
+            else:
+                plates.add(plate)
+                rows.append({'model': row.get('model'), 'brand': row.get('brand'), 'license_plate': plate,
+                             'available': parse_bool(row.get('available', True))})
+
+        # Bereits vorhandene Kennzeichen mit einer Abfrage pro Block ermitteln
+        existing = {plate for (plate,) in db.session.query(Car.license_plate).filter(Car.license_plate.in_(plates))} \
+            if plates else set()
+        for row in rows:
+            if row['license_plate'] in existing:
+                report.reject(row, 'Kennzeichen existiert bereits')
+        rows = [row for row in rows if row['license_plate'] not in existing]
+
+        if rows:
+            db.session.execute(insert(Car), rows) # executemany für den ganzen Block
+        db.session.commit()
+        report.inserted += len(rows)
+        click.echo(report.progress())
+    click.echo('Fertig: ' + report.progress())
+
+@cli.cli.command('import-bookings')
+@with_import_options
+def import_bookings(file, file_format, batch_size, rejects):
+    """Buchungen (user_id, car_id, start_date, end_date) blockweise importieren."""
+    report = ImportReport(rejects)
+    for chunk in chunked(read_rows(file, file_format, report), batch_size):
+        items = []
+        for row in chunk:
+            try:
+                item = (int(row['user_id']), int(row['car_id']), parse_date(row['start_date']), parse_date(row['end_date']))
+            except (KeyError, TypeError, ValueError) as e:
+                report.reject(row, 'Ungültige Zeile: %s' % e)
+                continue
+            if item[3] <= item[2]:
+                report.reject(row, 'Enddatum muss nach dem Startdatum liegen')
+            else:
+                items.append((row, item))
+
+        # Vorhandene Benutzer mit einer Abfrage pro Block ermitteln; unbekannte IDs würden den Fremdschlüssel
+        # verletzen (PostgreSQL/MySQL) und den Import nach bereits gespeicherten Blöcken abbrechen
+        user_ids = {item[0] for _, item in items}
+        known_users = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))} \
+            if user_ids else set()
+        for row, item in items:
+            if item[0] not in known_users:
+                report.reject(row, 'Benutzer nicht gefunden')
+        items = [(row, item) for row, item in items if item[0] in known_users]
+
+        # Autos sperren und Überschneidungen (im Block und mit der Datenbank) mengenbasiert prüfen
+        def work():
+            known_cars = lock_cars(item[1] for _, item in items)
+            candidates = [(row, item) for row, item in items if item[1] in known_cars]
+            conflicts = check_batch([item[1:] for _, item in candidates])
+            accepted = [item for (_, item), conflict in zip(candidates, conflicts) if conflict is None]
+            if accepted:
+                db.session.execute(insert(Booking), [
+                    {'user_id': user_id, 'car_id': car_id, 'start_date': start_date, 'end_date': end_date}
+                    for user_id, car_id, start_date, end_date in accepted
+                ])
+            return known_cars, candidates, conflicts, accepted
+
+        known_cars, candidates, conflicts, accepted = run_with_retry(work)
+        for row, item in items:
+            if item[1] not in known_cars:
+                report.reject(row, 'Auto nicht gefunden')
+        for (row, _), conflict in zip(candidates, conflicts):
+            if conflict is not None:
+                report.reject(row, 'Überschneidung mit einer anderen Buchung')
+                metrics.inc('booking_conflicts_total', {'source': 'import'})
+        for car_id in {item[1] for item in accepted}:
+            availability_cache.invalidate(car_id)
+            slot_calendar.invalidate(car_id)
+            availability_events.publish('changed', car_id) # Offene Buchungsseiten prüfen neu
+        report.inserted += len(accepted)
+        click.echo(report.progress())
+    click.echo('Fertig: ' + report.progress())
+
+@cli.cli.command('archive-bookings')
+@click.option('--before', default=None, help='Buchungen archivieren, die bis zu diesem Zeitpunkt enden (Standard: jetzt)')
+@click.option('--batch-size', default=1000, show_default=True, help='Buchungen pro Block und Transaktion')
+def archive_bookings(before, batch_size):
+    """Abgeschlossene Buchungen blockweise in die Tabelle booking_archive verschieben."""
+    now = datetime.now()
+    cutoff = parse_date(before) if before else now
+    if cutoff > now:
+        raise click.BadParameter('Zeitpunkt darf nicht in der Zukunft liegen', param_hint='--before')
+    started = time.perf_counter()
+    archived = 0
+    while True:
+        moved = run_with_retry(lambda: archive_batch(cutoff, batch_size)) # Kurze Transaktionen, damit laufende Buchungen nicht warten
+        if not moved:
+            break
+        archived += moved
+        elapsed = time.perf_counter() - started
+        click.echo('%d archiviert, %.0f Zeilen/s' % (archived, archived / elapsed if elapsed else 0))
+    click.echo('Fertig: %d Buchungen archiviert' % archived)
+
+@cli.cli.command('sync-sqlite-replicas')
+def sync_sqlite_replicas():
+    """SQLite-Replikate mit der Primärdatenbank abgleichen (für lokale Tests des Replikat-Routings)."""
+    primary = db.engines[None]
+    if primary.dialect.name != 'sqlite':
+        raise click.ClickException('Nur für SQLite-Datenbanken')
+    for key, engine in db.engines.items():
+        if not key or not key.startswith(REPLICA_PREFIX) or engine.dialect.name != 'sqlite':
+            continue
+        engine.dispose()
+        with sqlite3.connect(primary.url.database) as source, sqlite3.connect(engine.url.database) as target:
+            source.backup(target) # Konsistente Kopie über die SQLite-Backup-API
+        click.echo('%s: %s -> %s' % (key, primary.url.database, engine.url.database))
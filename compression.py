@@ -0,0 +1,58 @@
+# gzip-Komprimierung der Antworten, wenn der Client sie akzeptiert (Accept-Encoding) und die Antwort
+# gross genug ist. Gestreamte Antworten (NDJSON-Export) werden fortlaufend komprimiert.
+import gzip
+import zlib
+from flask import request
+
+DEFAULT_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/html', 'text/plain', 'text/css',
+                     'application/javascript')
+
+# Komprimierte Darstellung bekommt einen eigenen ETag (siehe table_versions.conditional_get)
+GZIP_ETAG_SUFFIX = '-gzip'
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits=31: gzip-Header und -Prüfsumme
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class Compression:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.level = app.config.get('COMPRESSION_LEVEL', 6)
+        self.mimetypes = set(app.config.get('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES))
+        if app.config.get('COMPRESSION_ENABLED', True):
+            app.after_request(self._compress)
+
+    def _compress(self, response):
+        # Dateien (send_file, statische Dateien) unterstützen Range-Anfragen und bleiben unverändert
+        if response.direct_passthrough or response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add('Accept-Encoding') # Auch unkomprimierte Antworten hängen vom Header ab
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers or request.method == 'HEAD'
+                or not request.accept_encodings['gzip']):
+            return response
+
+        if response.is_streamed:
+            response.response = _gzip_stream(response.response, self.level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(gzip.compress(data, self.level, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + GZIP_ETAG_SUFFIX, weak)
+        return response
@@ -1,10 +1,10 @@
 # Import der notwendigen Modul
 from dotenv import load_dotenv
 import os
+from engine_profiles import engine_options
+from replica_routing import replica_binds
 
-# Laden der Umgebungsvariablen aus der .env-Datei
-load_dotenv()
-# Basisverzeichnis der Anwendung bestimmen
+# Basisverzeichnis der Anwendung bestimmen und Umgebungsvariablen aus der .env-Datei laden
 basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
 
@@ -12,4 +12,89 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your_jwt_secret_key')  
+    # Pool-Grösse, Pre-Ping, Recycle und Timeouts je nach Backend (siehe engine_profiles.py)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Lese-Replikate (kommagetrennt); lesende Requests werden dorthin geleitet (siehe replica_routing.py)
+    SQLALCHEMY_BINDS = replica_binds(os.environ.get('DATABASE_REPLICA_URLS'))
+    REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', 5))
+    REPLICA_BUS = os.getenv('REPLICA_BUS', 'file') # 'file' (mehrere Worker) oder 'local'
+    REPLICA_DIR = os.getenv('REPLICA_DIR') # Standard: instance/replica_writes
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your_jwt_secret_key')
+
+    # Verfügbarkeits-Cache (siehe availability_cache.py)
+    AVAILABILITY_CACHE_ENABLED = os.getenv('AVAILABILITY_CACHE_ENABLED', '1') == '1'
+    AVAILABILITY_CACHE_MAX_CARS = int(os.getenv('AVAILABILITY_CACHE_MAX_CARS', 1000)) # LRU-Grenze
+    AVAILABILITY_CACHE_MAX_INTERVALS = int(os.getenv('AVAILABILITY_CACHE_MAX_INTERVALS', 5000)) # Pro Auto
+    AVAILABILITY_CACHE_BUS = os.getenv('AVAILABILITY_CACHE_BUS', 'file') # 'file' (mehrere Worker) oder 'local'
+    AVAILABILITY_CACHE_DIR = os.getenv('AVAILABILITY_CACHE_DIR') # Standard: instance/availability
+
+    # Monatskalender pro Auto (siehe slot_calendar.py)
+    CALENDAR_CACHE_ENABLED = os.getenv('CALENDAR_CACHE_ENABLED', '1') == '1'
+    CALENDAR_CACHE_MAX_ENTRIES = int(os.getenv('CALENDAR_CACHE_MAX_ENTRIES', 5000)) # (Auto, Monat)-Einträge
+    CALENDAR_CACHE_BUS = os.getenv('CALENDAR_CACHE_BUS', 'file') # 'file' (mehrere Worker) oder 'local'
+    CALENDAR_CACHE_DIR = os.getenv('CALENDAR_CACHE_DIR') # Standard: instance/calendar
+
+    # Push von Verfügbarkeitsänderungen per Server-Sent Events (siehe availability_events.py)
+    AVAILABILITY_EVENTS_ENABLED = os.getenv('AVAILABILITY_EVENTS_ENABLED', '1') == '1'
+    AVAILABILITY_EVENTS_BROKER = os.getenv('AVAILABILITY_EVENTS_BROKER', 'file') # 'file' (mehrere Worker) oder 'local'
+    AVAILABILITY_EVENTS_DIR = os.getenv('AVAILABILITY_EVENTS_DIR') # Standard: instance/events
+    AVAILABILITY_EVENTS_POLL_INTERVAL = float(os.getenv('AVAILABILITY_EVENTS_POLL_INTERVAL', 0.5)) # Sekunden
+    AVAILABILITY_EVENTS_HEARTBEAT = float(os.getenv('AVAILABILITY_EVENTS_HEARTBEAT', 15)) # Sekunden
+    AVAILABILITY_EVENTS_MAX_DURATION = float(os.getenv('AVAILABILITY_EVENTS_MAX_DURATION', 300)) # Sekunden pro Verbindung
+    # Offene Verbindungen pro Worker, deutlich unter GUNICORN_THREADS (jede belegt einen Thread); 0 = ohne Obergrenze
+    AVAILABILITY_EVENTS_MAX_STREAMS = int(os.getenv('AVAILABILITY_EVENTS_MAX_STREAMS', 4))
+
+    # Zulassungskontrolle der API (siehe admission.py); Grenzen als "Tokens pro Sekunde/Burst" pro Client
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') == '1'
+    ADMISSION_STORE = os.getenv('ADMISSION_STORE', 'file') # 'file' (mehrere Worker) oder 'memory'
+    ADMISSION_DIR = os.getenv('ADMISSION_DIR') # Standard: instance/admission
+    ADMISSION_DEFAULT_LIMIT = os.getenv('ADMISSION_DEFAULT_LIMIT', '20/40') # Für Endpunkte ohne eigene Grenze
+    ADMISSION_LIMITS = os.getenv('ADMISSION_LIMITS', 'api.api_login=1/5,api.create_booking=5/10,'
+                                 'api.create_bookings_batch=1/3,api.delete_booking=5/10,api.get_bookings=10/20,'
+                                 'api.get_utilization=1/5,api.availability_stream=0.1/5,'
+                                 'web.availability_stream=0.1/5')
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 16)) # Pro Worker; 0 = ohne Obergrenze
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0.1)) # Sekunden Wartezeit auf einen Platz
+
+    # Idempotency-Key für Buchungen (siehe idempotency.py)
+    IDEMPOTENCY_STORE = os.getenv('IDEMPOTENCY_STORE', 'file') # 'file' (mehrere Worker) oder 'memory'
+    IDEMPOTENCY_DIR = os.getenv('IDEMPOTENCY_DIR') # Standard: instance/idempotency
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400)) # Sekunden, so lange wird eine Antwort wiederholt
+    IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 30)) # Sekunden pro laufendem Versuch
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10)) # Wartezeit gleichzeitiger Duplikate
+
+    # Reservierung: Wiederholungen bei Sperrkonflikten (siehe booking_service.reserve)
+    RESERVATION_MAX_ATTEMPTS = int(os.getenv('RESERVATION_MAX_ATTEMPTS', 5))
+    RESERVATION_RETRY_BACKOFF = float(os.getenv('RESERVATION_RETRY_BACKOFF', 0.01)) # Sekunden
+
+    # Abfrage-Statistik pro Request (siehe query_stats.py)
+    QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', '1') == '1'
+    QUERY_STATS_HEADERS = os.getenv('QUERY_STATS_HEADERS', '0') == '1' # Im Debug-Modus immer aktiv
+    QUERY_STATS_NPLUSONE_THRESHOLD = int(os.getenv('QUERY_STATS_NPLUSONE_THRESHOLD', 5)) # Gleiche Abfrage n-mal
+
+    # Passwort-Hashing (siehe password_hashing.py); geänderte Parameter werden beim Login nachgezogen
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2)) # Gleichzeitige Hash-Berechnungen; 0 bei Sync-Workern
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10)) # Sekunden
+
+    # Cache für load_user (siehe user_cache.py); andere Worker sehen Änderungen spätestens nach der TTL
+    USER_CACHE_ENABLED = os.getenv('USER_CACHE_ENABLED', '1') == '1'
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60)) # Sekunden
+
+    # Änderungszähler pro Tabelle für ETag/Last-Modified (siehe table_versions.py)
+    TABLE_VERSIONS_BUS = os.getenv('TABLE_VERSIONS_BUS', 'file') # 'file' (mehrere Worker) oder 'local'
+    TABLE_VERSIONS_DIR = os.getenv('TABLE_VERSIONS_DIR') # Standard: instance/table_versions
+
+    # Prometheus-Metriken (siehe metrics.py); jeder Worker schreibt eine Datei in METRICS_DIR
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+    METRICS_DIR = os.getenv('METRICS_DIR') # Standard: instance/metrics
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1)) # Sekunden
+
+    # JSON-Serialisierung (siehe json_provider.py); orjson ist optional ("pip install orjson")
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto') # 'auto' (orjson, falls installiert), 'orjson' oder 'json'
+
+    # gzip-Komprimierung der Antworten (siehe compression.py)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', '1') == '1'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024)) # Bytes; kleinere Antworten unkomprimiert
+    COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6)) # 1 (schnell) bis 9 (klein)
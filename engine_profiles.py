@@ -0,0 +1,134 @@
+# Datenbank-spezifische Engine-Einstellungen (Pool, Pre-Ping, Recycle, Timeouts, SQLite-Pragmas)
+# und Pool-Statistiken pro Engine
+import os
+import threading
+import time
+import weakref
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+# QueuePool, der die Wartezeit auf eine freie Verbindung misst (inkl. Aufbau neuer Verbindungen)
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_total = 0.0 # Sekunden
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+# Engine-Optionen für SQLALCHEMY_ENGINE_OPTIONS anhand des Datenbank-Backends.
+# Werte können über Umgebungsvariablen angepasst werden; DB_ENGINE_PROFILE=0 schaltet alles ab.
+def engine_options(uri):
+    if not uri or os.getenv('DB_ENGINE_PROFILE', '1') != '1':
+        return {}
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+
+    if backend == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {} # In-Memory-Datenbank: SQLAlchemy verwendet einen eigenen Pool
+        return {
+            'poolclass': TimedQueuePool,
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            # Wartezeit des Treibers bei gesperrter Datenbank (zusätzlich zu PRAGMA busy_timeout)
+            'connect_args': {'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000},
+        }
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_pre_ping': True, # Abgebrochene Verbindungen vor der Verwendung erkennen
+    }
+    if backend == 'postgresql':
+        options['pool_recycle'] = _env_int('DB_POOL_RECYCLE', 1800)
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % statement_timeout}
+    elif backend == 'mysql':
+        # Unterhalb von wait_timeout (Standard 8h, bei Hostern oft 300s) recyceln
+        options['pool_recycle'] = _env_int('DB_POOL_RECYCLE', 280)
+        options['connect_args'] = {'init_command': 'SET SESSION MAX_EXECUTION_TIME=%d' % statement_timeout}
+    return options
+
+# SQLite-Pragmas bei jeder neuen Verbindung setzen (WAL erlaubt parallele Leser neben einem Schreiber)
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=%s' % os.getenv('SQLITE_JOURNAL_MODE', 'WAL'))
+    cursor.execute('PRAGMA synchronous=%s' % os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'))
+    cursor.execute('PRAGMA busy_timeout=%d' % _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    cursor.close()
+
+# Pragmas für alle SQLite-Engines der App registrieren
+def init_app(app, db):
+    if os.getenv('DB_ENGINE_PROFILE', '1') != '1':
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+                event.listen(engine, 'connect', _set_sqlite_pragmas)
+
+# Nach fork() (z.B. Gunicorn mit --preload) die geerbten Pools verwerfen, ohne die Verbindungen des
+# Elternprozesses zu schliessen; jeder Worker öffnet eigene Verbindungen.
+# Der Hook wird einmal pro Prozess registriert; die Anwendungen werden schwach referenziert.
+_fork_apps = weakref.WeakKeyDictionary() # App -> SQLAlchemy-Erweiterung
+
+def dispose_after_fork(app, db):
+    _fork_apps[app] = db
+
+def _dispose_after_fork():
+    for app, db in list(_fork_apps.items()):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_dispose_after_fork)
+
+# Aktuelle Pool-Statistik aller Engines (pro Worker-Prozess)
+def pool_stats(db):
+    stats = {}
+    for bind, engine in db.engines.items():
+        pool = engine.pool
+        entry = {'pool': type(pool).__name__, 'status': pool.status()}
+        if isinstance(pool, QueuePool):
+            entry.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+                         overflow=pool.overflow())
+        if isinstance(pool, TimedQueuePool):
+            entry.update(wait_count=pool.wait_count, wait_total_s=round(pool.wait_total, 6),
+                         wait_max_s=round(pool.wait_max, 6), timeouts=pool.timeouts)
+        stats[bind or 'default'] = entry
+    return stats
+
+# Pool-Wartezeiten als Werte für metrics.Metrics.register_collector()
+def pool_metrics(db):
+    samples = []
+    for bind, engine in db.engines.items():
+        pool = engine.pool
+        if isinstance(pool, TimedQueuePool):
+            labels = {'bind': bind or 'default'}
+            samples.append(('db_pool_waits_total', labels, pool.wait_count))
+            samples.append(('db_pool_wait_seconds_total', labels, pool.wait_total))
+            samples.append(('db_pool_timeouts_total', labels, pool.timeouts))
+    return samples
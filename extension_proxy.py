@@ -0,0 +1,21 @@
+# Stellvertreter für Erweiterungen, deren Zustand pro Anwendung in app.extensions liegt.
+# app.py legt die Stellvertreter beim Import an; init_app() erzeugt für jede Anwendung eine eigene Instanz
+# der Erweiterung. Attribute und Methoden werden beim Zugriff von der Instanz der aktuellen Anwendung
+# gelesen (App-Kontext nötig), sodass mehrere Anwendungen in einem Prozess (z.B. eine pro Test) weder
+# Caches noch Zähler oder Hooks teilen.
+from flask import current_app
+
+class ExtensionProxy:
+    def __init__(self, name, factory):
+        self.name = name # Schlüssel in app.extensions
+        self.factory = factory # Erweiterungsklasse, wird mit (app, *args) aufgerufen
+
+    def init_app(self, app, *args):
+        instance = self.factory(app, *args)
+        app.extensions[self.name] = instance
+        return instance
+
+    def __getattr__(self, attribute):
+        if attribute.startswith('__'):
+            raise AttributeError(attribute) # copy/pickle & Co. nicht an die Anwendung weiterreichen
+        return getattr(current_app.extensions[self.name], attribute)
@@ -0,0 +1,18 @@
+# Gunicorn-Konfiguration (wird beim Start im Projektverzeichnis automatisch geladen)
+#
+#   gunicorn -w 4                    -> Web-Oberfläche und API
+#   APP_PROFILE=api gunicorn -w 4    -> nur die JSON-API (ohne WTForms, Flask-Login-Views, Templates)
+import os
+
+wsgi_app = 'app:create_app()'
+
+# App einmal im Master laden; die Worker entstehen per fork() und teilen den importierten Code.
+# Geerbte Datenbank-Pools verwirft engine_profiles.dispose_after_fork() in jedem Worker.
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Threads pro Worker: offene Server-Sent-Event-Verbindungen (availability_events.py) belegen je einen
+# Thread statt eines ganzen Workers. Ihre Anzahl begrenzt AVAILABILITY_EVENTS_MAX_STREAMS pro Worker
+# (Standard 4 von 8 Threads), weitere Clients erhalten 503 und fragen die Verfügbarkeit per Polling ab.
+# Für sehr viele Verbindungen GUNICORN_WORKER_CLASS=gevent verwenden und die Obergrenze entsprechend erhöhen.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
@@ -0,0 +1,237 @@
+# Idempotency-Key für schreibende Buchungs-Routen: Wiederholte Requests mit demselben Schlüssel (z.B. nach
+# einem Timeout des Clients) erhalten die gespeicherte Antwort des ersten Versuchs, ohne die Buchung erneut
+# zu prüfen oder zu speichern. Gleichzeitige Duplikate warten auf den laufenden Versuch.
+import fcntl
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from functools import wraps
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+MAX_KEY_LENGTH = 255
+
+# Fingerabdruck des Requests: gleicher Schlüssel mit anderem Inhalt ist ein Fehler des Clients
+def request_fingerprint():
+    digest = hashlib.sha256()
+    digest.update(('%s %s\n' % (request.method, request.full_path)).encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+# Ergebnis von begin(): neu reserviert, abgeschlossen (gespeicherte Antwort), läuft noch, anderer Inhalt
+NEW, DONE, BUSY, MISMATCH = 'new', 'done', 'busy', 'mismatch'
+
+# Datensatz prüfen bzw. als laufend reservieren; liefert (Ergebnis, neuer Datensatz oder None)
+def _begin(record, fingerprint, lock_timeout, now):
+    if record is not None and record['expires'] > now:
+        if record['fingerprint'] != fingerprint:
+            return MISMATCH, None
+        if 'status' in record:
+            return DONE, None
+        return BUSY, None
+    # Kein oder abgelaufener Datensatz (auch ein laufender Versuch eines abgestürzten Workers)
+    return NEW, {'fingerprint': fingerprint, 'expires': now + lock_timeout}
+
+# Datensätze im Speicher des eigenen Prozesses (Einzelprozess / Tests)
+class MemoryIdempotencyStore:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._records = {}
+        self._condition = threading.Condition()
+
+    def begin(self, key, fingerprint, lock_timeout):
+        now = time.time()
+        with self._condition:
+            record = self._records.get(key)
+            result, new_record = _begin(record, fingerprint, lock_timeout, now)
+            if new_record is not None:
+                self._records[key] = new_record
+                if len(self._records) > self.max_keys:
+                    self._prune(now)
+            return result, record
+
+    def complete(self, key, record):
+        with self._condition:
+            self._records[key] = record
+            self._condition.notify_all()
+
+    def abort(self, key):
+        with self._condition:
+            self._records.pop(key, None)
+            self._condition.notify_all()
+
+    # Warten, bis der laufende Versuch für "key" abgeschlossen, abgebrochen oder abgelaufen ist. Der Zustand
+    # wird unter derselben Sperre geprüft, ein complete() zwischen begin() und wait() geht nicht verloren.
+    def wait(self, key, timeout):
+        def finished():
+            record = self._records.get(key)
+            return record is None or 'status' in record or record['expires'] <= time.time()
+        with self._condition:
+            self._condition.wait_for(finished, timeout)
+
+    def _prune(self, now):
+        for key, record in list(self._records.items()):
+            if record['expires'] <= now:
+                del self._records[key]
+
+# Datensätze für alle Worker: eine kleine, per flock gesperrte JSON-Datei pro Schlüssel.
+# Abgelaufene Dateien werden gelegentlich anhand des Änderungszeitpunkts entfernt.
+class FileIdempotencyStore:
+    def __init__(self, directory, ttl, poll_interval=0.05, sweep_every=100):
+        self.directory = directory
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.sweep_every = sweep_every
+        self._calls = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, name[:2], name + '.json')
+
+    # Datei gesperrt öffnen, Datensatz lesen und mit der Funktion "change" ersetzen oder löschen
+    def _update(self, key, change):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT), 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                try:
+                    record = json.loads(f.read() or 'null')
+                except ValueError:
+                    record = None
+                new_record, result = change(record)
+                if new_record is not None:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(new_record, separators=(',', ':')))
+                elif result is None:
+                    os.unlink(path)
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def begin(self, key, fingerprint, lock_timeout):
+        self._calls += 1
+        if self._calls % self.sweep_every == 0:
+            self._sweep()
+
+        def change(record):
+            result, new_record = _begin(record, fingerprint, lock_timeout, time.time())
+            return new_record, (result, record)
+        return self._update(key, change)
+
+    def complete(self, key, record):
+        self._update(key, lambda old: (record, True))
+
+    def abort(self, key):
+        self._update(key, lambda old: (None, None))
+
+    def wait(self, key, timeout):
+        time.sleep(min(timeout, self.poll_interval))
+
+    # Ein zufälliges Unterverzeichnis nach abgelaufenen Dateien durchsuchen
+    def _sweep(self):
+        directory = os.path.join(self.directory, '%02x' % random.randrange(256))
+        cutoff = time.time() - self.ttl
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+class Idempotency:
+    def __init__(self, app=None):
+        self.counts = {} # Ergebnis -> Anzahl (für /metrics)
+        self._counts_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', 86400) # Sekunden, so lange gilt ein Schlüssel
+        self.lock_timeout = app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 30) # Danach gilt ein laufender Versuch als abgebrochen
+        self.wait_timeout = app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 10) # Maximale Wartezeit eines Duplikats
+        if app.config.get('IDEMPOTENCY_STORE', 'file') == 'memory':
+            self.store = MemoryIdempotencyStore()
+        else:
+            directory = app.config.get('IDEMPOTENCY_DIR') or os.path.join(app.instance_path, 'idempotency')
+            self.store = FileIdempotencyStore(directory, self.ttl)
+
+    def count(self, outcome):
+        with self._counts_lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    # Werte für metrics.Metrics.register_collector()
+    def collect_metrics(self):
+        with self._counts_lock:
+            return [('idempotency_requests_total', {'outcome': outcome}, count) for outcome, count in self.counts.items()]
+
+def _replay(record):
+    response = make_response(record['body'], record['status'])
+    response.mimetype = record['mimetype']
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+# Route-Decorator (nach jwt_required): wertet den Header "Idempotency-Key" aus. Ohne Header bleibt die
+# Route unverändert. Gespeichert werden alle Antworten ausser 5xx; nach einem Serverfehler oder einer
+# Ausnahme darf der Client mit demselben Schlüssel erneut versuchen.
+def idempotent(idempotency):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if key is None:
+                return view(*args, **kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH or not key.isprintable():
+                return jsonify({'error': 'Ungültiger Idempotency-Key'}), 400
+
+            store = idempotency.store
+            scoped_key = '%s:%s' % (get_jwt_identity(), key) # Schlüssel gelten pro Benutzer
+            fingerprint = request_fingerprint()
+            deadline = time.monotonic() + idempotency.wait_timeout
+            while True:
+                result, record = store.begin(scoped_key, fingerprint, idempotency.lock_timeout)
+                if result != BUSY:
+                    break
+                if time.monotonic() >= deadline:
+                    idempotency.count('busy')
+                    response = jsonify({'error': 'Anfrage mit diesem Idempotency-Key wird noch bearbeitet'})
+                    response.status_code = 409
+                    response.headers['Retry-After'] = '1'
+                    return response
+                store.wait(scoped_key, deadline - time.monotonic()) # Gleichzeitiges Duplikat: auf den ersten Versuch warten
+
+            if result == MISMATCH:
+                idempotency.count('mismatch')
+                return jsonify({'error': 'Idempotency-Key wurde bereits für eine andere Anfrage verwendet'}), 422
+            if result == DONE:
+                idempotency.count('replayed')
+                return _replay(record)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                store.abort(scoped_key)
+                raise
+            if response.status_code >= 500 or response.is_streamed:
+                store.abort(scoped_key)
+                return response
+            store.complete(scoped_key, {
+                'fingerprint': fingerprint,
+                'expires': time.time() + idempotency.ttl,
+                'status': response.status_code,
+                'mimetype': response.mimetype,
+                'body': response.get_data(as_text=True),
+            })
+            idempotency.count('stored')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,84 @@
+# JSON-Provider der App: optional orjson (schneller, in C) statt des json-Moduls, Datumswerte direkt im
+# Format der API ("JJJJ-MM-TT HH:MM") sowie gemeinsame Serialisierer für Buchungen und Autos
+import json
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # orjson ist optional, ohne wird das json-Modul verwendet
+    orjson = None
+
+ENCODERS = ('auto', 'orjson', 'json')
+
+# Entspricht strftime('%Y-%m-%d %H:%M'), ist aber deutlich schneller
+def format_datetime(value):
+    return value.isoformat(' ', 'minutes')
+
+# Buchung (ORM-Objekt oder Ergebniszeile) als Dictionary; Datumswerte formatiert erst der Provider
+def booking_to_dict(booking):
+    return {'id': booking.id, 'user_id': booking.user_id, 'car_id': booking.car_id,
+            'start_date': booking.start_date, 'end_date': booking.end_date}
+
+# Auto als Dictionary
+def car_to_dict(car):
+    return {'id': car.id, 'brand': car.brand, 'model': car.model, 'license_plate': car.license_plate}
+
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        encoder = app.config.get('JSON_ENCODER', 'auto')
+        if encoder not in ENCODERS:
+            raise ValueError('Unbekannter JSON_ENCODER: %s' % encoder)
+        if encoder == 'orjson' and orjson is None:
+            raise RuntimeError('JSON_ENCODER=orjson, aber orjson ist nicht installiert')
+        self.use_orjson = orjson is not None and encoder != 'json'
+        self.encoder = 'orjson' if self.use_orjson else 'json'
+
+    # Datumswerte im API-Format, alles andere wie bei Flask (Decimal, UUID, Dataclasses, ...)
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return format_datetime(o)
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_options(self, sort_keys, indent):
+        # Datumswerte an default() übergeben (sonst ISO 8601 mit "T" und Sekunden);
+        # Nicht-String-Schlüssel wie beim json-Modul in Strings umwandeln
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _dumps_bytes(self, obj, sort_keys, indent):
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options(sort_keys, indent))
+
+    def dumps(self, obj, **kwargs):
+        # Sonderoptionen (cls, separators, ...) kann nur das json-Modul
+        if self.use_orjson and set(kwargs) <= {'sort_keys', 'indent', 'ensure_ascii'}:
+            return self._dumps_bytes(obj, kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent')).decode()
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s) # orjson.JSONDecodeError ist ein ValueError wie beim json-Modul
+        return json.loads(s, **kwargs)
+
+    # Antwort direkt aus den Bytes von orjson aufbauen (ohne Umweg über str)
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = None if self.compact or (self.compact is None and not self._app.debug) else 2
+        if self.use_orjson:
+            data = self._dumps_bytes(obj, self.sort_keys, indent) + b'\n'
+        else:
+            data = self.dumps(obj, indent=indent) + '\n'
+        return self._app.response_class(data, mimetype=self.mimetype)
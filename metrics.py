@@ -0,0 +1,260 @@
+# Prometheus-kompatible Metriken (Textformat) für mehrere Gunicorn-Worker.
+# Jeder Prozess schreibt seine Werte regelmässig in eine eigene Datei; /metrics summiert alle Dateien.
+# Dateien beendeter Prozesse werden in "archived.json" zusammengeführt, damit ihre Zähler erhalten bleiben
+# und ein neuer Prozess mit derselben PID sie nicht überschreibt.
+import atexit
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from flask import Response, g, request, request_started, request_finished
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (key, _escape(value)) for key, value in pairs)
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+ARCHIVE_FILE = 'archived.json'
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Prozess eines anderen Benutzers
+    return True
+
+# Werte einer Prozessdatei zu "counters" / "histograms" addieren
+def _merge(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, entry in data['histograms']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        if key in histograms:
+            histograms[key] = [a + b for a, b in zip(histograms[key], entry)]
+        else:
+            histograms[key] = list(entry)
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# JSON atomar schreiben: eindeutige Temporärdatei (gleichzeitige Threads), danach umbenennen
+def _write(directory, path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.%d-' % os.getpid(), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+_instances = weakref.WeakSet() # Aktive Instanzen (eine pro Anwendung), beim Beenden schreiben
+
+# Einmal pro Prozess registriert (nicht pro create_app)
+@atexit.register
+def _flush_at_exit():
+    for instance in list(_instances):
+        with instance.app.app_context():
+            instance.flush()
+
+class Metrics:
+    def __init__(self, app=None):
+        self.definitions = {} # Name -> (Typ, Beschreibung, Buckets)
+        self.counters = {} # (Name, Labels) -> Wert
+        self.histograms = {} # (Name, Labels) -> [Bucket-Zähler..., Summe, Anzahl]
+        self.collectors = [] # Funktionen, die beim Schreiben absolute Zählerstände liefern
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # Ein Schreibvorgang pro Prozess gleichzeitig
+        self._last_flush = 0.0
+        self._flush_pid = None # PID, für die die eigene Datei bereits geschrieben wurde
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.directory = app.config.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.archive_stale_files() # Dateien aus früheren Läufen übernehmen
+        self.define('http_request_duration_seconds', 'histogram', 'Dauer der HTTP-Requests pro Endpunkt und Status')
+        self.define('db_queries_total', 'counter', 'Anzahl SQL-Abfragen pro Endpunkt')
+        self.define('db_query_duration_seconds_total', 'counter', 'Summierte Datenbankzeit pro Endpunkt')
+        request_started.connect(self._request_started, app)
+        request_finished.connect(self._request_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        _instances.add(self)
+
+    def define(self, name, metric_type, description, buckets=DEFAULT_BUCKETS):
+        self.definitions[name] = (metric_type, description, tuple(buckets))
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        buckets = self.definitions[name][2]
+        key = (name, _labels_key(labels))
+        with self._lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [0] * len(buckets) + [0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[index] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    # Zusätzliche Quelle registrieren: liefert Liste von (Name, Labels, absoluter Wert)
+    def register_collector(self, collector):
+        self.collectors.append(collector)
+
+    def _request_started(self, sender, **extra):
+        g.metrics_start = time.perf_counter()
+
+    def _request_finished(self, sender, response, **extra):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        endpoint = request.endpoint or 'none'
+        labels = {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)}
+        self.observe('http_request_duration_seconds', time.perf_counter() - start, labels)
+        stats = g.get('query_stats')
+        if stats is not None and stats.count:
+            self.inc('db_queries_total', {'endpoint': endpoint}, stats.count)
+            self.inc('db_query_duration_seconds_total', {'endpoint': endpoint}, stats.duration)
+        if time.monotonic() - self._last_flush > self.flush_interval:
+            self.flush(blocking=False) # Schreibt bereits ein anderer Thread, genügt dessen Stand
+
+    # Eigene Werte atomar in die Prozessdatei schreiben. Fehler werden nur protokolliert,
+    # damit ein Request nie wegen der Metriken fehlschlägt.
+    def flush(self, blocking=True):
+        if not getattr(self, 'enabled', False):
+            return
+        if not self._flush_lock.acquire(blocking=blocking):
+            return
+        try:
+            pid = os.getpid()
+            if self._flush_pid != pid:
+                # Erster Schreibvorgang dieses Prozesses: eine vorhandene Datei mit derselben PID stammt
+                # von einem beendeten Prozess und wird archiviert statt überschrieben
+                self.archive_stale_files()
+                self._flush_pid = pid
+            with self._lock:
+                counters = [[name, labels, value] for (name, labels), value in self.counters.items()]
+                histograms = [[name, labels, entry] for (name, labels), entry in self.histograms.items()]
+            for collector in self.collectors:
+                try:
+                    counters.extend([name, _labels_key(labels), value] for name, labels, value in collector())
+                except Exception:
+                    self.app.logger.exception('Metrik-Collector fehlgeschlagen')
+            path = os.path.join(self.directory, '%d.json' % pid)
+            _write(self.directory, path, {'counters': counters, 'histograms': histograms})
+            self._last_flush = time.monotonic()
+        except OSError as e:
+            self.app.logger.warning('Metriken konnten nicht geschrieben werden: %s', e)
+        finally:
+            self._flush_lock.release()
+
+    # Dateien beendeter Prozesse (und eine noch nicht geschriebene eigene PID) in ARCHIVE_FILE zusammenführen.
+    # Gesperrt über ".lock", damit /metrics keine Werte doppelt oder gar nicht zählt.
+    def archive_stale_files(self):
+        try:
+            with self._directory_lock(fcntl.LOCK_EX):
+                stale = []
+                for path in glob.glob(os.path.join(self.directory, '*.json')) + \
+                        glob.glob(os.path.join(self.directory, '.*.tmp')):
+                    name = os.path.basename(path)
+                    try:
+                        pid = int(name.lstrip('.').split('.')[0].split('-')[0])
+                    except ValueError:
+                        continue # ARCHIVE_FILE
+                    if (pid == os.getpid() and self._flush_pid != pid) or not _pid_alive(pid):
+                        stale.append(path)
+                if not stale:
+                    return
+                counters, histograms = {}, {}
+                archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+                for path in [archive_path] + stale:
+                    data = _read(path) if path.endswith('.json') else None
+                    if data is not None:
+                        _merge(counters, histograms, data)
+                _write(self.directory, archive_path, {
+                    'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                    'histograms': [[name, labels, entry] for (name, labels), entry in histograms.items()],
+                })
+                for path in stale:
+                    os.unlink(path)
+        except OSError as e:
+            self.app.logger.warning('Alte Metrik-Dateien konnten nicht archiviert werden: %s', e)
+
+    def _directory_lock(self, operation):
+        lock = open(os.path.join(self.directory, '.lock'), 'a')
+        fcntl.flock(lock, operation)
+        return lock # Beim Schliessen (with-Block) wird die Sperre freigegeben
+
+    # Dateien aller laufenden Prozesse und das Archiv beendeter Prozesse summieren
+    def collect(self):
+        counters, histograms = {}, {}
+        with self._directory_lock(fcntl.LOCK_SH):
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                data = _read(path)
+                if data is not None:
+                    _merge(counters, histograms, data)
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.collect()
+        lines = []
+        for name in sorted({key[0] for key in counters} | {key[0] for key in histograms}):
+            metric_type, description, buckets = self.definitions.get(name, ('counter', '', DEFAULT_BUCKETS))
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s %s' % (name, metric_type))
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append('%s%s %s' % (name, _format_labels(labels), _format_value(value)))
+            for (metric, labels), entry in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, entry):
+                    cumulative += count
+                    lines.append('%s_bucket%s %d' % (name, _format_labels(labels, [('le', _format_value(bound))]), cumulative))
+                lines.append('%s_bucket%s %d' % (name, _format_labels(labels, [('le', '+Inf')]), entry[-1]))
+                lines.append('%s_sum%s %s' % (name, _format_labels(labels), repr(float(entry[-2]))))
+                lines.append('%s_count%s %d' % (name, _format_labels(labels), entry[-1]))
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        self.flush()
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
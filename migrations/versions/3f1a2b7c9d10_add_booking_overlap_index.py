@@ -0,0 +1,26 @@
+"""add composite index for booking overlap checks
+
+Revision ID: 3f1a2b7c9d10
+Revises: c49773989c6c
+Create Date: 2026-10-18 09:12:04.114532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a2b7c9d10'
+down_revision = 'c49773989c6c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_car_id_start_date_end_date', ['car_id', 'start_date', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_car_id_start_date_end_date')
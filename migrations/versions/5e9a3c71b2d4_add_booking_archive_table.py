@@ -0,0 +1,43 @@
+"""add booking_archive table for completed bookings
+
+Revision ID: 5e9a3c71b2d4
+Revises: d7e2c4a9b613
+Create Date: 2026-10-18 14:12:05.733190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9a3c71b2d4'
+down_revision = 'd7e2c4a9b613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('booking_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('car_id', sa.Integer(), nullable=False),
+    sa.Column('start_date', sa.DateTime(), nullable=False),
+    sa.Column('end_date', sa.DateTime(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['car_id'], ['car.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_booking_archive_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_booking_archive_end_date'), ['end_date'], unique=False)
+        batch_op.create_index('ix_booking_archive_car_id_start_date', ['car_id', 'start_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_archive_car_id_start_date')
+        batch_op.drop_index(batch_op.f('ix_booking_archive_end_date'))
+        batch_op.drop_index(batch_op.f('ix_booking_archive_user_id'))
+
+    op.drop_table('booking_archive')
@@ -0,0 +1,26 @@
+"""add index on booking.user_id for filtered listings
+
+Revision ID: 8b4e6d2a1c55
+Revises: 3f1a2b7c9d10
+Create Date: 2026-10-18 10:03:51.402817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d2a1c55'
+down_revision = '3f1a2b7c9d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_booking_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_booking_user_id'))
@@ -0,0 +1,37 @@
+"""use AUTOINCREMENT for booking ids on SQLite (no reuse of archived ids)
+
+Revision ID: a4d8f1b6e7c2
+Revises: 5e9a3c71b2d4
+Create Date: 2026-10-18 16:40:12.208514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8f1b6e7c2'
+down_revision = '5e9a3c71b2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL und MySQL vergeben IDs über Sequenzen bzw. AUTO_INCREMENT ohnehin nie doppelt
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('booking', recreate='always', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+    # Zähler hinter die höchste bisher vergebene ID setzen, auch die bereits archivierten
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'booking'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'booking', MAX(COALESCE(MAX(id), 0), "
+        "(SELECT COALESCE(MAX(id), 0) FROM booking_archive)) FROM booking"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('booking', recreate='always', table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
@@ -0,0 +1,33 @@
+"""add exclusion constraint against overlapping bookings (PostgreSQL only)
+
+Revision ID: d7e2c4a9b613
+Revises: 8b4e6d2a1c55
+Create Date: 2026-10-18 11:27:40.519306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2c4a9b613'
+down_revision = '8b4e6d2a1c55'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Andere Datenbanken verlassen sich auf die Zeilensperre in booking_service.reserve()
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE booking ADD CONSTRAINT booking_no_overlap '
+        'EXCLUDE USING gist (car_id WITH =, tsrange(start_date, end_date) WITH &&)'
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('ALTER TABLE booking DROP CONSTRAINT booking_no_overlap')
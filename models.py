@@ -1,8 +1,10 @@
 # Import relevanter Module für Datums- und Benutzerverwaltung
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from app import db, login # Import der Datenbank (SQLAlchemy) und der Login-Verwaltung
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from replica_routing import use_primary
+from app import db, login, password_hasher, user_cache # Import der Datenbank (SQLAlchemy), der Login-Verwaltung, des Hashers und des Caches
 
 # Benutzer-Modell für die User-Authentifizierung und Verwaltung
 class User(UserMixin, db.Model):
@@ -16,16 +18,49 @@ class User(UserMixin, db.Model):
 
     # Methode zum Setzen des Passworts (Hashing für Sicherheit)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     # Methode zum Überprüfen des Passworts
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
-# Ladefunktion für Flask-Login (findet Benutzer anhand der ID)
+    # Nach erfolgreichem Login: Hash mit den aktuell konfigurierten Parametern neu berechnen
+    def upgrade_password_hash(self, password):
+        if password_hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+            db.session.commit()
+
+# Im Cache gespeicherte Spalten (ohne Passwort-Hash; dieser wird bei Bedarf nachgeladen)
+USER_CACHE_COLUMNS = ('id', 'username', 'email')
+
+# Ladefunktion für Flask-Login (findet Benutzer anhand der ID, bevorzugt aus dem Cache)
 @login.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    user_id = int(id)
+    if not user_cache.enabled:
+        with use_primary():
+            return db.session.get(User, user_id)
+
+    values = user_cache.get(user_id)
+    if values is not None:
+        # Objekt aus den gecachten Werten aufbauen und ohne Abfrage an die Session hängen
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        with use_primary(): # Neu registrierter Benutzer ist evtl. noch nicht repliziert
+            user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, {column: getattr(user, column) for column in USER_CACHE_COLUMNS})
+    return user
+
+# Geänderte oder gelöschte Benutzer aus dem Cache entfernen
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
 
 # Fahrzeug-Modell für die Verwaltung von Autos
 class Car(db.Model):
@@ -38,8 +73,28 @@ class Car(db.Model):
 # Buchungs-Modell für das Reservierungssystem
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)  # Eindeutige Buchungs-ID
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # Verknüpfung zur User-Tabelle (FK)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True) # Verknüpfung zur User-Tabelle (FK)
     car_id = db.Column(db.Integer, db.ForeignKey('car.id'), nullable=False)  # Verknüpfung zur Car-Tabelle (FK)
     start_date = db.Column(db.DateTime, nullable=False) # Startzeitpunkt der Buchung
     end_date = db.Column(db.DateTime, nullable=False) # Endzeitpunkt der Buchung
     car = db.relationship('Car', backref='bookings')  # Beziehung zu Car (1 Buchung bezieht sich auf genau 1 Auto)
+
+    # Zusammengesetzter Index für die Überlappungsprüfung (siehe booking_service.py).
+    # AUTOINCREMENT: SQLite vergibt IDs gelöschter oder archivierter Buchungen sonst erneut
+    __table_args__ = (
+        db.Index('ix_booking_car_id_start_date_end_date', 'car_id', 'start_date', 'end_date'),
+        {'sqlite_autoincrement': True},
+    )
+
+# Archivierte (abgeschlossene) Buchungen – gleiche Spalten und IDs wie in "booking" (siehe booking_archive.py)
+class BookingArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False) # ID der ursprünglichen Buchung
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    car_id = db.Column(db.Integer, db.ForeignKey('car.id'), nullable=False)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False, index=True) # Für den Archiv-Horizont (max(end_date))
+    archived_at = db.Column(db.DateTime, nullable=False) # Zeitpunkt der Archivierung
+
+    __table_args__ = (
+        db.Index('ix_booking_archive_car_id_start_date', 'car_id', 'start_date'),
+    )
@@ -0,0 +1,103 @@
+# Passwort-Hashing in einem begrenzten Thread-Pool mit konfigurierbaren Kostenparametern.
+# Der Pool begrenzt die gleichzeitigen Berechnungen pro Worker; er gibt den Request-Thread aber nicht frei
+# (dieser wartet auf das Ergebnis). Nur bei Gunicorn-Workern mit mehreren Threads (gthread, siehe
+# gunicorn.conf.py) verhindert er, dass ein Login-Ansturm alle Threads mit Hashes belegt. Bei Sync-Workern
+# bearbeitet jeder Worker ohnehin nur einen Request; dort PASSWORD_HASH_WORKERS=0 setzen (ohne Pool).
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Der Pool war zu lange ausgelastet (PASSWORD_HASH_TIMEOUT); die Login-Routen antworten mit 503
+class HashPoolBusy(Exception):
+    pass
+
+# Laufzeit-Statistik einer Operation (Anzahl, Summe und Maximum in Sekunden)
+class HashTimer:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, duration):
+        with self._lock:
+            self.count += 1
+            self.total += duration
+            self.max = max(self.max, duration)
+
+    def as_dict(self):
+        average = self.total / self.count if self.count else 0.0
+        return {'count': self.count, 'total_s': self.total, 'avg_s': average, 'max_s': self.max}
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.timers = {'hash': HashTimer(), 'verify': HashTimer()}
+        self._executor = None
+        self._prefix = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Werkzeug-Methodenstring, z.B. "scrypt:32768:8:1" oder "pbkdf2:sha256:1000000"
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2) # 0 = im Request-Thread berechnen
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self._prefix = None
+
+    # Vollständiger Präfix gespeicherter Hashes ("scrypt" ergibt z.B. "scrypt:32768:8:1"); erst beim ersten
+    # Login berechnet, damit create_app() keinen Hash berechnen muss
+    @property
+    def prefix(self):
+        if self._prefix is None:
+            self._prefix = generate_password_hash('x', self.method).split('$', 1)[0]
+        return self._prefix
+
+    # Pool erst bei Bedarf starten (Threads überleben ein fork() des Gunicorn-Masters nicht)
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    def _run(self, operation, func, *args):
+        def timed():
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.timers[operation].observe(time.perf_counter() - start)
+        if not self.workers:
+            return timed()
+        # Höchstens "workers" Hashes gleichzeitig; weitere Anfragen warten in der Queue des Pools.
+        # Nach "timeout" Sekunden wird HashPoolBusy geworfen (concurrent.futures.TimeoutError ist erst ab
+        # Python 3.11 dasselbe wie das eingebaute TimeoutError)
+        future = self.executor.submit(timed)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            future.cancel() # Noch nicht gestartete Berechnung aus der Queue entfernen
+            raise HashPoolBusy() from e
+
+    def hash(self, password):
+        return self._run('hash', generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash or password is None:
+            return False
+        return self._run('verify', check_password_hash, password_hash, password)
+
+    # Hash wurde mit anderen Parametern erstellt als aktuell konfiguriert
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    def stats(self):
+        return {operation: timer.as_dict() for operation, timer in self.timers.items()}
+
+    # Werte für metrics.Metrics.register_collector()
+    def collect_metrics(self):
+        samples = []
+        for operation, timer in self.timers.items():
+            samples.append(('password_hash_total', {'operation': operation}, timer.count))
+            samples.append(('password_hash_seconds_total', {'operation': operation}, timer.total))
+        return samples
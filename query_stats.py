@@ -0,0 +1,104 @@
+# Zählt SQL-Abfragen und Datenbankzeit pro Request (SQLAlchemy-Engine-Events) und erkennt N+1-Muster
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+# Sammelt die Abfragen eines Requests oder eines query_budget()-Blocks
+class QueryCollector:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0 # Sekunden
+        self.statements = Counter() # Gleiche SQL-Form (ohne Parameterwerte) -> Anzahl
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    # Abfragen, die mindestens "threshold" Mal mit gleicher Form ausgeführt wurden (N+1-Verdacht)
+    def repeated(self, threshold):
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+def _active_collectors():
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    return _local.collectors
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_stats_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_stats_start'].pop()
+    for collector in _active_collectors():
+        collector.record(statement, duration)
+
+@contextmanager
+def collect_queries():
+    collector = QueryCollector()
+    _active_collectors().append(collector)
+    try:
+        yield collector
+    finally:
+        _active_collectors().remove(collector)
+
+# Test-Hilfe: schlägt fehl, wenn der Block mehr als max_queries Abfragen ausführt
+#   with query_budget(3):
+#       client.get('/bookings')
+@contextmanager
+def query_budget(max_queries):
+    with collect_queries() as collector:
+        yield collector
+    if collector.count > max_queries:
+        details = '\n'.join('%dx %s' % (count, statement) for statement, count in collector.statements.most_common())
+        raise AssertionError('%d Abfragen ausgeführt, erlaubt sind %d:\n%s' % (collector.count, max_queries, details))
+
+# Test-Hilfe: Route mit dem Flask-Testclient aufrufen und das Abfragebudget prüfen
+def assert_query_budget(client, path, max_queries, method='GET', **kwargs):
+    with query_budget(max_queries):
+        return client.open(path, method=method, **kwargs)
+
+# Flask-Erweiterung: misst jeden Request, loggt das Ergebnis und setzt im Debug-Modus Antwort-Header
+class QueryStats:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.threshold = app.config.get('QUERY_STATS_NPLUSONE_THRESHOLD', 5)
+        if not app.config.get('QUERY_STATS_ENABLED', True):
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+    def _start(self):
+        g.query_stats = QueryCollector()
+        _active_collectors().append(g.query_stats)
+
+    def _finish(self, response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        if self.app.debug or self.app.config.get('QUERY_STATS_HEADERS', False):
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['Server-Timing'] = 'db;dur=%.2f;desc="%d queries"' % (stats.duration * 1000, stats.count)
+        self.app.logger.info('%s %s -> %s: %d Abfragen, %.1f ms DB-Zeit', request.method, request.path,
+                             response.status_code, stats.count, stats.duration * 1000)
+        for statement, count in stats.repeated(self.threshold):
+            self.app.logger.warning('Mögliches N+1-Problem in %s %s: %dx %s', request.method, request.path,
+                                    count, ' '.join(statement.split()))
+        return response
+
+    def _teardown(self, exc):
+        stats = g.pop('query_stats', None)
+        if stats is not None and stats in _active_collectors():
+            _active_collectors().remove(stats)
@@ -0,0 +1,129 @@
+# Lese-/Schreib-Trennung: lesende Requests gehen an Replikate, Schreibvorgänge an die Primärdatenbank.
+# Benutzer lesen nach eigenen Schreibvorgängen für ein konfigurierbares Zeitfenster von der Primärdatenbank.
+import os
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, request, session as web_session
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+from availability_cache import FileInvalidationBus, LocalInvalidationBus
+
+REPLICA_PREFIX = 'replica' # Bind-Keys der Replikate in SQLALCHEMY_BINDS beginnen damit
+
+# SQLALCHEMY_BINDS für kommagetrennte Replikat-URLs (z.B. aus DATABASE_REPLICA_URLS)
+def replica_binds(urls):
+    urls = [url.strip() for url in (urls or '').split(',') if url.strip()]
+    return {'%s_%d' % (REPLICA_PREFIX, index): url for index, url in enumerate(urls, 1)}
+
+# Session, die lesende Abfragen in als lesend markierten Requests an ein Replikat schickt
+class RoutingSession(FlaskSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._read_from_replica(clause):
+            router = current_app.extensions.get('replica_router')
+            engine = router.pick_replica(self._db) if router is not None else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _read_from_replica(self, clause):
+        if not has_request_context() or g.get('db_route') != 'replica':
+            return False
+        if self._flushing or self.info.get('replica_wrote'):
+            return False # Eigene Änderungen dieses Requests sind nur auf der Primärdatenbank sichtbar
+        # Nur reine SELECTs ohne Sperre; DML, Text-SQL und SELECT ... FOR UPDATE gehen an die Primärdatenbank
+        return isinstance(clause, Select) and clause._for_update_arg is None
+
+# Schreibvorgänge der Session merken; nach dem Commit liest der Benutzer für das Zeitfenster von der
+# Primärdatenbank. Die Listener werden beim Import einmal registriert und gelten für alle Anwendungen.
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    session.info['replica_wrote'] = True
+
+# Bulk-Statements (session.execute(insert(...))) laufen nicht über den Flush
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _do_orm_execute(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info['replica_wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _after_commit(session):
+    router = current_app.extensions.get('replica_router') if has_app_context() else None
+    if session.info.pop('replica_wrote', False) and router is not None and has_request_context():
+        router.mark_write(g.get('db_identity'))
+
+# Route-Decorator: Request gilt als lesend, auch wenn die HTTP-Methode nicht GET ist (z.B. POST-Abfragen)
+def read_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.get('db_route') != 'primary_pinned':
+            g.db_route = 'replica'
+        return view(*args, **kwargs)
+    wrapper.read_only = True
+    return wrapper
+
+# Abfragen innerhalb des Blocks an die Primärdatenbank schicken
+@contextmanager
+def use_primary():
+    previous = g.get('db_route')
+    g.db_route = 'primary'
+    try:
+        yield
+    finally:
+        g.db_route = previous
+
+class ReplicaRouter:
+    def __init__(self, app=None, db=None):
+        self.bus = LocalInvalidationBus()
+        self.window = 0
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.window = app.config.get('REPLICA_READ_YOUR_WRITES_SECONDS', 5)
+        self.enabled = any(key and key.startswith(REPLICA_PREFIX) for key in app.config.get('SQLALCHEMY_BINDS') or {})
+        app.extensions['replica_router'] = self
+        if not self.enabled:
+            return
+        if app.config.get('REPLICA_BUS', 'file') == 'file':
+            directory = app.config.get('REPLICA_DIR') or os.path.join(app.instance_path, 'replica_writes')
+            self.bus = FileInvalidationBus(directory)
+        app.before_request(self._route_request)
+
+    def pick_replica(self, db):
+        replicas = [engine for key, engine in db.engines.items() if key and key.startswith(REPLICA_PREFIX)]
+        return random.choice(replicas) if replicas else None
+
+    # Benutzer-ID des Requests ohne Datenbankzugriff ermitteln (Session-Cookie oder JWT)
+    def _identity(self):
+        if '_user_id' in web_session:
+            return str(web_session['_user_id'])
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            return None
+        return str(identity) if identity is not None else None
+
+    def _route_request(self):
+        g.db_identity = self._identity()
+        view = current_app.view_functions.get(request.endpoint)
+        reading = request.method in ('GET', 'HEAD', 'OPTIONS') or getattr(view, 'read_only', False)
+        if not reading:
+            g.db_route = 'primary'
+        elif g.db_identity is not None and self.wrote_recently(g.db_identity):
+            g.db_route = 'primary_pinned' # Read-your-writes: eigene Änderungen sind evtl. noch nicht repliziert
+        else:
+            g.db_route = 'replica'
+
+    def wrote_recently(self, identity):
+        key = 'user-%s' % identity
+        return bool(self.bus.version(key)) and time.time() - self.bus.modified(key) < self.window
+
+    # Nach einem Schreibvorgang liest der Benutzer für das Zeitfenster von der Primärdatenbank
+    def mark_write(self, identity):
+        if self.enabled and identity is not None:
+            self.bus.bump('user-%s' % identity)
@@ -1,23 +1,36 @@
 # Import relevanter Module
-from flask import render_template, redirect, url_for, flash, request, jsonify, Blueprint
+from flask import render_template, redirect, url_for, flash, request, jsonify, Blueprint, current_app, make_response
 from flask_login import login_user, logout_user, current_user, login_required
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
 from urllib.parse import urlparse
-from app import db, app
+from app import db, metrics, availability_events
 from models import User, Car, Booking
 from forms import LoginForm, RegistrationForm, BookingForm, CarForm
+from booking_service import is_available, booking_deleted, reserve, BookingConflict, CarNotFound
 from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from replica_routing import read_only
+from password_hashing import HashPoolBusy
+from availability_events import parse_car_ids
+
+# Blueprint für die Web-Oberfläche (nur im Profil "web" registriert, siehe app.create_app)
+web = Blueprint('web', __name__)
 
 # Startseite (geschützt durch Login)
-@app.route('/')
-@app.route('/index')
+@web.route('/')
+@web.route('/index')
 @login_required
 def index():
     return render_template('index.html', title='Home')
 
+# Antwort, wenn die Passwortprüfung wegen ausgelastetem Hash-Pool abbricht (HashPoolBusy, siehe password_hashing.py)
+def login_busy(response):
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
 # Login-Funktion
-@app.route("/login", methods=["GET", "POST"])
+@web.route("/login", methods=["GET", "POST"])
 def login():
     form = LoginForm()
 
@@ -31,24 +44,35 @@ def login():
         email = data.get("email")
         password = data.get("password")
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(password):
-            access_token = create_access_token(identity=user.id) # Erstelle ein JWT-Token
-            return jsonify(access_token=access_token) # Sende das Token zurück
+        try:
+            if user and user.check_password(password):
+                user.upgrade_password_hash(password)
+                access_token = create_access_token(identity=user.id) # Erstelle ein JWT-Token
+                return jsonify(access_token=access_token) # Sende das Token zurück
+        except HashPoolBusy:
+            return login_busy(jsonify({"msg": "Server ausgelastet, bitte später erneut versuchen"}))
+        metrics.inc('login_failures_total', {'channel': 'web_json'})
         return jsonify({"msg": "Invalid credentials"}), 401
 
     # Wenn Formulardaten gesendet werden (Web-Login)
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
-            login_user(user) # Nutzer einloggen
-            flash("Login erfolgreich!", "success")
-            return redirect(url_for("index"))
-
+        try:
+            if user and user.check_password(form.password.data):
+                user.upgrade_password_hash(form.password.data)
+                login_user(user) # Nutzer einloggen
+                flash("Login erfolgreich!", "success")
+                return redirect(url_for("web.index"))
+        except HashPoolBusy:
+            flash("Anmeldung momentan nicht möglich, bitte später erneut versuchen.", "warning")
+            return login_busy(make_response(render_template("login.html", form=form)))
+
+    metrics.inc('login_failures_total', {'channel': 'web'})
     flash("Ungültige Anmeldedaten!", "danger")
-    return redirect(url_for("login"))
+    return redirect(url_for("web.login"))
 
 # Logout-Funktion
-@app.route('/logout', methods=['POST'])
+@web.route('/logout', methods=['POST'])
 @login_required  # Nur für eingeloggte Benutzer
 @jwt_required(optional=True)  # Falls jemand mit JWT kommt
 def logout():
@@ -56,84 +80,69 @@ def logout():
         return jsonify({"msg": "Logged out successfully"}), 200 # API-Logout
     logout_user()
     flash('Du wurdest erfolgreich ausgeloggt.', 'success')
-    return redirect(url_for('index'))
+    return redirect(url_for('web.index'))
 
 # Registrierung eines neuen Benutzers
-@app.route('/register', methods=['GET', 'POST'])
+@web.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index')) # Falls bereits eingeloggt, weiterleiten
+        return redirect(url_for('web.index')) # Falls bereits eingeloggt, weiterleiten
     form = RegistrationForm()
     if form.validate_on_submit():
         existing_user = User.query.filter_by(username=form.username.data).first()
         if existing_user:
             flash('Benutzername bereits vergeben. Bitte wählen Sie einen anderen.', 'danger')
             return render_template('register.html', title='Registrierung', form=form)
-        user = User(
-            username=form.username.data,
-            email=form.email.data,
-            password_hash=generate_password_hash(form.password.data) # Passwort verschlüsseln
-        )
+        user = User(username=form.username.data, email=form.email.data)
+        user.set_password(form.password.data) # Passwort verschlüsseln (im Hash-Pool)
         db.session.add(user) # Neuen Benutzer in die Datenbank speichern
         db.session.commit()
         flash('Registrierung erfolgreich! Sie können sich jetzt anmelden.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('web.login'))
     return render_template('register.html', title='Registrierung', form=form)
 
 
 # Buchungsseite (Benutzer kann ein Auto buchen)
-@app.route('/bookings', methods=['GET', 'POST'])
+@web.route('/bookings', methods=['GET', 'POST'])
 @login_required
 def bookings():
     form = BookingForm()
     available_cars = Car.query.filter_by(available=True).all() # Alle verfügbaren Autos abrufen
-    user_bookings = Booking.query.filter_by(user_id=current_user.id).all() # Buchungen des Benutzers abrufen
+    # Buchungen des Benutzers inkl. Auto in einer Abfrage laden (Template greift auf booking.car zu)
+    user_bookings = Booking.query.options(joinedload(Booking.car)).filter_by(user_id=current_user.id).all()
 
     # Setze die Optionen für das Dropdown-Feld
     form.car_id.choices = [(car.id, f"{car.brand} {car.model} - {car.license_plate}") for car in available_cars]
 
-    if request.method == "POST":
-        print("🔍 POST-Request erkannt!")
-        print(request.form)  # Zeigt die gesendeten Formulardaten an
-
     if form.validate_on_submit():
-        print("✅ Form wurde validiert!")
         car_id = form.car_id.data
         start_date = form.start_date.data
         end_date = form.end_date.data
-        print(f"🔍 Daten erhalten: Auto-ID={car_id}, Start={start_date}, Ende={end_date}")
 
-        # Prüfen, ob das Auto im Zeitraum bereits gebucht ist
-        existing_booking = Booking.query.filter(
-            Booking.car_id == car_id,
-            Booking.start_date < end_date,
-            Booking.end_date > start_date
-        ).first()
-
-        if existing_booking:
-            print("❌ Buchung nicht möglich: Auto bereits gebucht.")
-            flash("Dieses Auto ist im gewählten Zeitraum bereits gebucht.", "danger")
-        else:
-            new_booking = Booking(user_id=current_user.id, car_id=car_id, start_date=start_date, end_date=end_date)
-            db.session.add(new_booking)
-            db.session.commit()
-            print("✅ Buchung erfolgreich gespeichert!")
+        # Auto sperren, Überschneidung prüfen und Buchung atomar speichern
+        try:
+            reserve(current_user.id, car_id, start_date, end_date)
             flash("Buchung erfolgreich erstellt!", "success")
-            return redirect(url_for('bookings'))
+            return redirect(url_for('web.bookings'))
+        except BookingConflict:
+            metrics.inc('booking_conflicts_total', {'source': 'web'})
+            flash("Dieses Auto ist im gewählten Zeitraum bereits gebucht.", "danger")
+        except CarNotFound:
+            flash("Dieses Auto existiert nicht.", "danger")
 
-    # Debugging: Wenn das Formular nicht validiert wurde
+    # Wenn das Formular nicht validiert wurde
     if form.errors:
-        print("⚠️ Fehler bei der Validierung:", form.errors)
+        current_app.logger.debug("Fehler bei der Validierung: %s", form.errors)
         flash("Es gab ein Problem mit dem Buchungsformular.", "danger")
 
     return render_template('bookings.html', form=form, available_cars=available_cars, user_bookings=user_bookings)
 
 # Auto hinzufügen (Admin-Funktion)
-@app.route('/add_car', methods=['GET', 'POST'])
+@web.route('/add_car', methods=['GET', 'POST'])
 @login_required
 def add_car():
     if not current_user.is_authenticated:
-        return redirect(url_for('login')) # Falls nicht eingeloggt, weiterleiten
+        return redirect(url_for('web.login')) # Falls nicht eingeloggt, weiterleiten
 
     form = CarForm()
     if form.validate_on_submit():
@@ -146,32 +155,42 @@ def add_car():
         db.session.add(new_car)
         db.session.commit()
         flash('Auto erfolgreich hinzugefügt!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('web.index'))
     
     return render_template('add_car.html', form=form)
 
 # API-Endpoint zur Verfügbarkeitsprüfung eines Autos
-@app.route('/check_availability', methods=['POST'])
+@web.route('/check_availability', methods=['POST'])
+@read_only # Reine Abfrage trotz POST: darf von einem Replikat gelesen werden
 @login_required
 def check_availability():
-    data = request.get_json()
-    car_id = data.get('car_id')
-    start_date = datetime.strptime(data.get('start_date'), "%Y-%m-%dT%H:%M")
-    end_date = datetime.strptime(data.get('end_date'), "%Y-%m-%dT%H:%M")
-
-    existing_booking = Booking.query.filter(
-        Booking.car_id == car_id,
-        Booking.end_date > start_date,
-        Booking.start_date < end_date
-    ).first()
-
-    if existing_booking:
+    data = request.get_json(silent=True)
+    # Auto-ID als Zahl: Caches und Invalidierung verwenden int-Schlüssel (das Formular sendet Strings)
+    try:
+        car_id = int(data.get('car_id'))
+        start_date = datetime.strptime(data.get('start_date'), "%Y-%m-%dT%H:%M")
+        end_date = datetime.strptime(data.get('end_date'), "%Y-%m-%dT%H:%M")
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"error": "Ungültige Daten"}), 400
+
+    if not is_available(car_id, start_date, end_date):
         return jsonify({"available": False, "message": "Dieses Auto ist im gewählten Zeitraum bereits gebucht."})
     
     return jsonify({"available": True, "message": "Dieses Auto ist verfügbar!"})
 
+# Änderungen der Verfügbarkeit als Server-Sent Events (ersetzt wiederholtes /check_availability)
+# Parameter: car_id (kommagetrennt)
+@web.route('/availability/stream')
+@login_required
+def availability_stream():
+    try:
+        car_ids = parse_car_ids(request.args.get('car_id'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return availability_events.stream(car_ids, request.headers.get('Last-Event-ID'))
+
 # Stornieren einer Buchung
-@app.route('/cancel_booking/<int:booking_id>', methods=['POST'])
+@web.route('/cancel_booking/<int:booking_id>', methods=['POST'])
 @login_required
 def cancel_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
@@ -179,7 +198,7 @@ def cancel_booking(booking_id):
     # Überprüfen, ob der Benutzer die Buchung wirklich besitzt
     if booking.user_id != current_user.id:
         flash("Du kannst nur deine eigenen Buchungen stornieren!", "danger")
-        return redirect(url_for('bookings'))
+        return redirect(url_for('web.bookings'))
 
     # Auto wieder auf verfügbar setzen
     car = Car.query.get(booking.car_id)
@@ -188,6 +207,7 @@ def cancel_booking(booking_id):
 
     db.session.delete(booking)
     db.session.commit()
+    booking_deleted(booking) # Verfügbarkeits-Cache nachführen
 
     flash("Die Buchung wurde erfolgreich storniert.", "success")
-    return redirect(url_for('bookings'))
+    return redirect(url_for('web.bookings'))
@@ -1,8 +1,28 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, Response, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from app import db # Datenbank-Instanz importieren
-from models import Booking, Car, User # Import der Datenbank-Modelle
+from app import db, table_versions, metrics, availability_events, idempotency # Datenbank-Instanz und Änderungszähler importieren
+from table_versions import conditional_get
+from idempotency import idempotent
+from password_hashing import HashPoolBusy
+from json_provider import booking_to_dict, car_to_dict # Gemeinsame Serialisierer (Datumswerte formatiert der Provider)
+from engine_profiles import pool_stats
+from analytics import utilization_report
+from models import Booking, BookingArchive, Car, User # Import der Datenbank-Modelle
+from booking_archive import booking_rows
+from availability_events import parse_car_ids
+from booking_service import check_batch, free_cars_query, booking_created, booking_deleted, lock_cars, run_with_retry, \
+    month_slots, reserve, CarNotFound, BookingConflict, BATCH_CONFLICT # Zentrale Konfliktprüfung
 from datetime import datetime  # Datumsformatierung für Buchungen
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+DATE_FORMAT = '%Y-%m-%d %H:%M' # Datumsformat der API
+DEFAULT_PAGE_SIZE = 100 # Standardanzahl Buchungen pro Seite
+MAX_PAGE_SIZE = 1000 # Obergrenze für den Parameter "limit"
+STREAM_CHUNK_SIZE = 1000 # Zeilen pro Abruf beim NDJSON-Export
+MAX_BATCH_SIZE = 500 # Maximale Anzahl Buchungen pro Stapel-Anfrage
+MAX_CALENDAR_CARS = 100 # Maximale Anzahl Autos pro Kalender-Anfrage
+CALENDAR_SLOT_MINUTES = (15, 60) # Erlaubte Slot-Längen
 
 # API Blueprint für getrennte API-Routen
 api = Blueprint('api', __name__)
@@ -18,75 +38,276 @@ def api_login():
     user = User.query.filter_by(username=username).first()
 
     # Überprüfung der Anmeldedaten
-    if user and user.check_password(password):
-        access_token = create_access_token(identity=str(user.id)) # JWT-Token erstellen
-        return jsonify(access_token=access_token), 200 # Token zurückgeben
-    else:
-        return jsonify({"msg": "Invalid credentials"}), 401  # Fehler bei falschen Daten
+    try:
+        if user and user.check_password(password):
+            user.upgrade_password_hash(password) # Hash bei geänderten Parametern erneuern
+            access_token = create_access_token(identity=str(user.id)) # JWT-Token erstellen
+            return jsonify(access_token=access_token), 200 # Token zurückgeben
+    except HashPoolBusy: # Hash-Pool ausgelastet (siehe password_hashing.py)
+        return jsonify({"msg": "Server ausgelastet, bitte später erneut versuchen"}), 503, {'Retry-After': '5'}
+    metrics.inc('login_failures_total', {'channel': 'api'})
+    return jsonify({"msg": "Invalid credentials"}), 401  # Fehler bei falschen Daten
+
+# Filterbedingungen aus den Query-Parametern (user_id, car_id, from, to, after) ableiten
+# (für die Live-Tabelle oder das Archiv, siehe booking_archive.py)
+def booking_filters(args, model=Booking):
+    filters = []
+    if 'user_id' in args:
+        filters.append(model.user_id == int(args['user_id']))
+    if 'car_id' in args:
+        filters.append(model.car_id == int(args['car_id']))
+    if 'from' in args: # Buchungen, die nach diesem Zeitpunkt enden
+        filters.append(model.end_date > datetime.strptime(args['from'], DATE_FORMAT))
+    if 'to' in args: # Buchungen, die vor diesem Zeitpunkt beginnen
+        filters.append(model.start_date < datetime.strptime(args['to'], DATE_FORMAT))
+    if 'after' in args: # Keyset-Cursor: nur Buchungen mit grösserer ID
+        filters.append(model.id > int(args['after']))
+    return filters
+
+# Buchungszeilen für die Query-Parameter; archivierte Buchungen werden nur gelesen, wenn der
+# Zeitraum (Parameter "from") vor den Archiv-Horizont zurückreicht
+def filtered_booking_rows(args):
+    ended_after = datetime.strptime(args['from'], DATE_FORMAT) if 'from' in args else None
+    return booking_rows(booking_filters(args), booking_filters(args, BookingArchive), ended_after)
+
+# NDJSON-Export: Zeilen werden über einen serverseitigen Cursor gelesen und einzeln gesendet
+def stream_bookings(rows):
+    stmt = select(rows).order_by(rows.c.id).execution_options(yield_per=STREAM_CHUNK_SIZE)
+
+    def generate():
+        dumps = current_app.json.dumps
+        for row in db.session.execute(stmt):
+            yield dumps(booking_to_dict(row)) + '\n'
 
-# API-Route: Alle Buchungen abrufen (nur für authentifizierte Benutzer)
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# API-Route: Buchungen seitenweise abrufen (nur für authentifizierte Benutzer)
+# Parameter: limit, after (Cursor), user_id, car_id, from, to; format=ndjson für den Vollexport
 @api.route('/api/bookings', methods=['GET'])
 @jwt_required() # Authentifizierung über JWT erforderlich
+@conditional_get(table_versions, 'booking') # 304, solange sich keine Buchung geändert hat
 def get_bookings():
-    bookings = Booking.query.all() # Alle Buchungen aus der Datenbank abrufen
-    return jsonify([{
-        'id': booking.id,
-        'user_id': booking.user_id,
-        'car_id': booking.car_id,
-        'start_date': booking.start_date.strftime('%Y-%m-%d %H:%M'),
-        'end_date': booking.end_date.strftime('%Y-%m-%d %H:%M')
-    } for booking in bookings]) # JSON-Antwort mit allen Buchungen
+    try:
+        rows = filtered_booking_rows(request.args)
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Ungültige Filterparameter'}), 400
+    if limit < 1:
+        return jsonify({'error': 'Ungültige Filterparameter'}), 400
+
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        return stream_bookings(rows)
+
+    # Eine Zeile mehr laden, um festzustellen, ob eine weitere Seite existiert
+    bookings = db.session.execute(select(rows).order_by(rows.c.id).limit(limit + 1)).all()
+    has_more = len(bookings) > limit
+    bookings = bookings[:limit]
+
+    response = jsonify([booking_to_dict(booking) for booking in bookings]) # JSON-Antwort mit einer Seite Buchungen
+    if has_more:
+        # Cursor für die nächste Seite im Header mitgeben (Antwortformat bleibt eine Liste)
+        response.headers['X-Next-Cursor'] = str(bookings[-1].id)
+        next_args = request.args.to_dict()
+        next_args['after'] = bookings[-1].id
+        next_args['limit'] = limit
+        response.headers['Link'] = '<%s>; rel="next"' % url_for('api.get_bookings', **next_args)
+    return response
+
+# API-Route: Alle freien Autos für einen Zeitraum suchen
+# Parameter: start_date, end_date (Pflicht), brand, model, limit, after (Cursor)
+@api.route('/api/cars/available', methods=['GET'])
+@jwt_required() # Authentifizierung über JWT erforderlich
+def search_available_cars():
+    try:
+        start_date = datetime.strptime(request.args['start_date'], DATE_FORMAT)
+        end_date = datetime.strptime(request.args['end_date'], DATE_FORMAT)
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        after = int(request.args.get('after', 0))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Ungültige Suchparameter'}), 400
+    if end_date <= start_date or limit < 1:
+        return jsonify({'error': 'Ungültige Suchparameter'}), 400
+
+    query = free_cars_query(start_date, end_date).filter(Car.id > after)
+    if 'brand' in request.args:
+        query = query.filter(Car.brand == request.args['brand'])
+    if 'model' in request.args:
+        query = query.filter(Car.model == request.args['model'])
+
+    # Eine Zeile mehr laden, um festzustellen, ob eine weitere Seite existiert
+    cars = query.order_by(Car.id).limit(limit + 1).all()
+    has_more = len(cars) > limit
+    cars = cars[:limit]
+
+    response = jsonify([car_to_dict(car) for car in cars])
+    if has_more:
+        response.headers['X-Next-Cursor'] = str(cars[-1].id)
+        next_args = request.args.to_dict()
+        next_args['after'] = cars[-1].id
+        next_args['limit'] = limit
+        response.headers['Link'] = '<%s>; rel="next"' % url_for('api.search_available_cars', **next_args)
+    return response
+
+# API-Route: Monatskalender freier Slots für ein oder mehrere Autos
+# Parameter: car_id (kommagetrennt), month (JJJJ-MM), slot (15 oder 60 Minuten)
+# "free" ist eine Base64-kodierte Bitmap (1 = frei), Bit 0 = erster Slot des Monats (höchstwertiges Bit)
+@api.route('/api/cars/calendar', methods=['GET'])
+@jwt_required() # Authentifizierung über JWT erforderlich
+def get_calendar():
+    try:
+        car_ids = list(dict.fromkeys(int(car_id) for car_id in request.args['car_id'].split(',')))
+        month_start = datetime.strptime(request.args['month'], '%Y-%m')
+        slot_minutes = int(request.args.get('slot', 60))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Ungültige Kalenderparameter'}), 400
+    if slot_minutes not in CALENDAR_SLOT_MINUTES:
+        return jsonify({'error': 'Slot-Länge muss 15 oder 60 Minuten sein'}), 400
+    if len(car_ids) > MAX_CALENDAR_CARS:
+        return jsonify({'error': f'Maximal {MAX_CALENDAR_CARS} Autos pro Anfrage'}), 400
+
+    known_cars = {car_id for (car_id,) in db.session.query(Car.id).filter(Car.id.in_(car_ids))}
+    if len(known_cars) != len(car_ids):
+        return jsonify({'error': 'Auto nicht gefunden'}), 404
+
+    calendars = month_slots(car_ids, month_start)
+    return jsonify({
+        'month': month_start.strftime('%Y-%m'),
+        'slot_minutes': slot_minutes,
+        'cars': [dict(calendars[car_id].to_dict(slot_minutes), car_id=car_id) for car_id in car_ids]
+    })
+
+# API-Route: Änderungen der Verfügbarkeit als Server-Sent Events (text/event-stream)
+# Parameter: car_id (kommagetrennt); Ereignisse "availability" mit type, car_id, start_date, end_date
+@api.route('/api/cars/availability/stream', methods=['GET'])
+@jwt_required() # Authentifizierung über JWT erforderlich
+def availability_stream():
+    try:
+        car_ids = parse_car_ids(request.args.get('car_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return availability_events.stream(car_ids, request.headers.get('Last-Event-ID'))
 
 # API-Route: Einzelne Buchung abrufen
 @api.route('/api/bookings/<int:booking_id>', methods=['GET'])
 @jwt_required() # Authentifizierung über JWT erforderlich
+@conditional_get(table_versions, 'booking')
 def get_booking(booking_id):
     booking = Booking.query.get(booking_id) # Buchung in der Datenbank suchen
+    if booking is None:
+        booking = db.session.get(BookingArchive, booking_id) # Abgeschlossene Buchung im Archiv?
     if booking is None:
         return jsonify({'error': 'Buchung nicht gefunden'}), 404 # Falls nicht vorhanden, Fehler zurückgeben
-    return jsonify({
-        'id': booking.id,
-        'user_id': booking.user_id,
-        'car_id': booking.car_id,
-        'start_date': booking.start_date.strftime('%Y-%m-%d %H:%M'),
-        'end_date': booking.end_date.strftime('%Y-%m-%d %H:%M')
-    })     # JSON-Antwort mit Buchungsdetails
+    return jsonify(booking_to_dict(booking))     # JSON-Antwort mit Buchungsdetails
+
+# Buchungsdaten (einzelne Buchung oder Eintrag einer Stapel-Anfrage) prüfen und in (car_id, start_date, end_date) umwandeln
+# Wirft ValueError bzw. TypeError (z.B. bei einer Liste statt einer Auto-ID)
+def parse_booking_item(item):
+    if not isinstance(item, dict) or 'car_id' not in item or 'start_date' not in item or 'end_date' not in item:
+        raise ValueError('Ungültige Daten')
+    start_date = datetime.strptime(item['start_date'], DATE_FORMAT)
+    end_date = datetime.strptime(item['end_date'], DATE_FORMAT)
+    if end_date <= start_date:
+        raise ValueError('Enddatum muss nach dem Startdatum liegen')
+    return int(item['car_id']), start_date, end_date
 
 # API-Route: Neue Buchung erstellen
 @api.route('/api/bookings', methods=['POST'])
 @jwt_required() # Authentifizierung erforderlich
+@idempotent(idempotency) # Wiederholungen mit gleichem Idempotency-Key liefern die erste Antwort
 def create_booking():
-    user_id = get_jwt_identity() # Benutzer-ID aus dem Token abrufen
+    user_id = int(get_jwt_identity()) # Benutzer-ID aus dem Token abrufen
     data = request.get_json() # JSON-Daten aus der Anfrage abrufen
 
-    # Überprüfung, ob alle benötigten Daten vorhanden sind
-    if not data or 'car_id' not in data or 'start_date' not in data or 'end_date' not in data:
+    # Überprüfung, ob alle benötigten Daten vorhanden und gültig sind (Auto-ID als Zahl, Datumswerte)
+    try:
+        car_id, start_date, end_date = parse_booking_item(data)
+    except (ValueError, TypeError):
         return jsonify({'error': 'Ungültige Daten'}), 400
 
-    car_id = data['car_id']
-    start_date = datetime.strptime(data['start_date'], '%Y-%m-%d %H:%M')    # Datum in datetime-Objekt umwandeln
-    end_date = datetime.strptime(data['end_date'], '%Y-%m-%d %H:%M')
-
-    # Prüfen, ob das Auto im gewählten Zeitraum bereits gebucht wurde
-    overlapping_booking = Booking.query.filter(
-        Booking.car_id == car_id,
-        Booking.end_date >= start_date,
-        Booking.start_date <= end_date
-    ).first()
-
-    if overlapping_booking:
+    # Auto sperren, Überschneidung prüfen und Buchung atomar speichern
+    try:
+        new_booking = reserve(user_id, car_id, start_date, end_date)
+    except CarNotFound:
+        return jsonify({'error': 'Auto nicht gefunden'}), 404
+    except BookingConflict:
+        metrics.inc('booking_conflicts_total', {'source': 'api'})
         return jsonify({'error': 'Auto ist in diesem Zeitraum bereits gebucht'}), 400
-   
-    # Neue Buchung anlegen und speichern
-    new_booking = Booking(user_id=user_id, car_id=car_id, start_date=start_date, end_date=end_date)
-    db.session.add(new_booking)
-    db.session.commit()
 
     return jsonify({'message': 'Buchung erfolgreich', 'booking_id': new_booking.id}), 201
 
+# API-Route: Mehrere Buchungen in einer Anfrage erstellen
+# Erwartet {"bookings": [{car_id, start_date, end_date}, ...]} und liefert den Status jedes Eintrags
+@api.route('/api/bookings/batch', methods=['POST'])
+@jwt_required() # Authentifizierung erforderlich
+@idempotent(idempotency)
+def create_bookings_batch():
+    user_id = int(get_jwt_identity()) # Benutzer-ID aus dem Token abrufen
+    data = request.get_json(silent=True)
+    items = data.get('bookings') if isinstance(data, dict) else None
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Ungültige Daten'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Maximal {MAX_BATCH_SIZE} Buchungen pro Anfrage'}), 400
+
+    # Einträge validieren; ungültige werden gemeldet, aber nicht geprüft
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, parse_booking_item(item)))
+        except (ValueError, TypeError) as e:
+            results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+
+    # Betroffene Autos sperren, Konflikte innerhalb des Stapels und mit bestehenden Buchungen
+    # ermitteln und alle akzeptierten Buchungen in einer Transaktion speichern
+    def work():
+        outcome = {}
+        known_cars = lock_cars(car_id for _, (car_id, _, _) in valid)
+        candidates = [(index, item) for index, item in valid if item[0] in known_cars]
+        for index, (car_id, _, _) in valid:
+            if car_id not in known_cars:
+                outcome[index] = {'index': index, 'status': 'invalid', 'error': 'Auto nicht gefunden'}
+
+        conflicts = check_batch([item for _, item in candidates])
+        created = []
+        for (index, (car_id, start_date, end_date)), conflict in zip(candidates, conflicts):
+            if conflict is None:
+                created.append((index, Booking(user_id=user_id, car_id=car_id, start_date=start_date, end_date=end_date)))
+            else:
+                error = 'Überschneidung mit einer anderen Buchung im Stapel' if conflict == BATCH_CONFLICT \
+                    else 'Auto ist in diesem Zeitraum bereits gebucht'
+                outcome[index] = {'index': index, 'status': 'conflict', 'error': error}
+        db.session.add_all([booking for _, booking in created])
+        db.session.flush()
+        return outcome, created
+
+    try:
+        outcome, new_bookings = run_with_retry(work)
+    except IntegrityError:
+        # Ausschluss-Constraint der Datenbank (PostgreSQL) hat eine gleichzeitig gespeicherte Überschneidung
+        # erkannt: einmal neu prüfen, check_batch sieht die andere Buchung jetzt und meldet sie pro Eintrag
+        db.session.rollback()
+        try:
+            outcome, new_bookings = run_with_retry(work)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'Konflikt beim Speichern, bitte erneut versuchen'}), 409
+    conflicts = sum(1 for result in outcome.values() if result['status'] == 'conflict')
+    if conflicts:
+        metrics.inc('booking_conflicts_total', {'source': 'api_batch'}, conflicts)
+    for index, result in outcome.items():
+        results[index] = result
+    for index, booking in new_bookings:
+        booking_created(booking) # Verfügbarkeits-Cache nachführen
+        results[index] = {'index': index, 'status': 'created', 'booking_id': booking.id}
+
+    return jsonify({'created': len(new_bookings), 'results': results}), 200
+
 # API-Route: Buchung löschen
 @api.route('/api/bookings/<int:booking_id>', methods=["DELETE"])
 @jwt_required() # Authentifizierung erforderlich
+@idempotent(idempotency)
 def delete_booking(booking_id):
     try:
         current_user_id = int(get_jwt_identity())  # Token-ID in Integer umwandeln
@@ -101,10 +322,36 @@ def delete_booking(booking_id):
 
         db.session.delete(booking)
         db.session.commit()
+        booking_deleted(booking) # Verfügbarkeits-Cache nachführen
 
         return jsonify({"message": "Buchung erfolgreich storniert"}), 200 # Erfolgreiche Stornierung zurückgeben
 
     except Exception as e:
         return jsonify({"error": f"Interner Fehler: {str(e)}"}), 500 # Fehler zurückgeben, falls unerwartet
 
+# API-Route: Auslastung pro Auto und Marke (gebuchte / verfügbare Stunden)
+# Parameter: start_date, end_date, granularity (day oder week)
+@api.route('/api/analytics/utilization', methods=['GET'])
+@jwt_required() # Authentifizierung erforderlich
+def get_utilization():
+    try:
+        start_date = datetime.strptime(request.args['start_date'], DATE_FORMAT)
+        end_date = datetime.strptime(request.args['end_date'], DATE_FORMAT)
+        report = utilization_report(start_date, end_date, request.args.get('granularity', 'day'))
+    except KeyError:
+        return jsonify({'error': 'start_date und end_date sind erforderlich'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'granularity': report['granularity'],
+        'buckets': report['buckets'],
+        'cars': report['cars'],
+        'brands': report['brands']
+    })
 
+# API-Route: Verbindungspool-Statistik des antwortenden Worker-Prozesses
+@api.route('/api/stats/db-pool', methods=['GET'])
+@jwt_required() # Authentifizierung erforderlich
+def get_pool_stats():
+    return jsonify(pool_stats(db))
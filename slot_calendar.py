@@ -0,0 +1,114 @@
+# Monatskalender pro Auto: Belegung in 15-Minuten-Slots, aus einer Abfrage gerastert und pro (Auto, Monat)
+# gecacht. Neue und stornierte Buchungen werden direkt in die gecachten Monate eingetragen.
+import base64
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from availability_cache import FileInvalidationBus, LocalInvalidationBus
+
+SLOT = timedelta(minutes=15) # Kleinste Auflösung; gröbere Slots (z.B. 60 Minuten) werden daraus abgeleitet
+
+# Erster Tag des Monats (00:00) und Beginn des Folgemonats
+def month_bounds(month_start):
+    month_start = month_start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if month_start.month == 12:
+        return month_start, month_start.replace(year=month_start.year + 1, month=1)
+    return month_start, month_start.replace(month=month_start.month + 1)
+
+# Belegungszähler pro Slot eines Monats. Zähler statt Bits, da sich zwei Buchungen einen Slot teilen
+# können (z.B. Ende 10:05, Beginn 10:10) und eine Stornierung den Slot dann nicht freigeben darf.
+class MonthSlots:
+    def __init__(self, month_start, version):
+        self.start, self.end = month_bounds(month_start)
+        self.version = version # Stand der Invalidierung beim Laden
+        self.counts = bytearray((self.end - self.start) // SLOT)
+
+    # Buchung [start_date, end_date) eintragen (delta=1) oder entfernen (delta=-1); ausserhalb des Monats ignoriert
+    def add(self, start_date, end_date, delta=1):
+        start_date, end_date = max(start_date, self.start), min(end_date, self.end)
+        if start_date >= end_date:
+            return
+        first = (start_date - self.start) // SLOT
+        last = -(-(end_date - self.start) // SLOT) # Aufrunden: angebrochene Slots gelten als belegt
+        self.counts[first:last] = bytes(min(max(count + delta, 0), 255) for count in self.counts[first:last])
+
+    # Bitmap der freien Slots (1 = frei), Bit 0 ist das höchstwertige Bit des ersten Bytes.
+    # Bei gröberen Slots ist ein Slot nur frei, wenn alle enthaltenen 15-Minuten-Slots frei sind.
+    def free_bitmap(self, slot_minutes=15):
+        step = slot_minutes // 15
+        bits = ''.join('0' if any(self.counts[i:i + step]) else '1' for i in range(0, len(self.counts), step))
+        padded = bits + '0' * (-len(bits) % 8)
+        return int(padded, 2).to_bytes(len(padded) // 8, 'big'), len(bits), bits.count('1')
+
+    def to_dict(self, slot_minutes=15):
+        bitmap, slots, free_slots = self.free_bitmap(slot_minutes)
+        return {'slots': slots, 'free_slots': free_slots, 'free': base64.b64encode(bitmap).decode('ascii')}
+
+# LRU-Cache der Monatskalender; die Versionsnummer pro Auto wird zwischen den Workern geteilt
+class SlotCalendar:
+    def __init__(self, app=None):
+        self._entries = OrderedDict() # (car_id, Monatsbeginn) -> MonthSlots
+        self._lock = threading.Lock()
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CALENDAR_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('CALENDAR_CACHE_MAX_ENTRIES', 5000)
+        if app.config.get('CALENDAR_CACHE_BUS', 'file') == 'local':
+            self.bus = LocalInvalidationBus()
+        else:
+            directory = app.config.get('CALENDAR_CACHE_DIR') or os.path.join(app.instance_path, 'calendar')
+            self.bus = FileInvalidationBus(directory)
+
+    # Gültigen Eintrag liefern; veraltete Einträge (andere Worker haben geschrieben) werden verworfen
+    def get(self, car_id, month_start):
+        key = (car_id, month_start)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != self.bus.version(car_id):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, car_id, entry):
+        key = (car_id, entry.start)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Am längsten nicht genutzten Monat verdrängen
+
+    # Write-Through nach einer Änderung: alle gecachten Monate des Autos nachführen, andere Worker invalidieren
+    def _apply(self, car_id, start_date, end_date, delta):
+        old, new = self.bus.bump(car_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == car_id]:
+                entry = self._entries[key]
+                if entry.version != old:
+                    del self._entries[key] # Zwischenzeitlich hat ein anderer Worker geschrieben
+                    continue
+                entry.add(start_date, end_date, delta)
+                entry.version = new
+
+    def booking_added(self, car_id, start_date, end_date):
+        self._apply(car_id, start_date, end_date, 1)
+
+    def booking_removed(self, car_id, start_date, end_date):
+        self._apply(car_id, start_date, end_date, -1)
+
+    # Änderung mit unbekanntem Inhalt (z.B. Stapel-Import): Monate des Autos neu laden lassen
+    def invalidate(self, car_id):
+        self.bus.bump(car_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == car_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,109 @@
+# Änderungszähler pro Tabelle und bedingte GET-Anfragen (ETag / Last-Modified)
+import os
+import time
+import zlib
+from functools import wraps
+from email.utils import formatdate
+from flask import current_app, g, has_app_context, request, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from availability_cache import FileInvalidationBus, LocalInvalidationBus
+from compression import GZIP_ETAG_SUFFIX
+
+# Geänderte Tabellen pro Session sammeln und nach dem Commit die Zähler der aktuellen Anwendung erhöhen.
+# Die Listener werden beim Import einmal registriert und gelten für alle Anwendungen im Prozess.
+def _mark(session, table):
+    session.info.setdefault('changed_tables', set()).add(table)
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table is not None and (obj in session.new or obj in session.deleted or session.is_modified(obj)):
+            _mark(session, table)
+
+# INSERT/UPDATE/DELETE-Statements, die an der Unit of Work vorbeilaufen (z.B. session.execute(insert(...)))
+@event.listens_for(Session, 'do_orm_execute')
+def _do_orm_execute(state):
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        _mark(state.session, state.bind_mapper.local_table.name)
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    changed = session.info.pop('changed_tables', ())
+    table_versions = current_app.extensions.get('table_versions') if has_app_context() else None
+    if table_versions is not None:
+        for table in changed:
+            table_versions.bump(table)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('changed_tables', None)
+
+# Zählt pro Tabelle die bestätigten Schreibvorgänge; der Zähler wird nach jedem Commit erhöht,
+# der Zeilen dieser Tabelle verändert hat (ORM-Objekte und Bulk-Statements)
+class TableVersions:
+    def __init__(self, app=None):
+        self.bus = LocalInvalidationBus()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('TABLE_VERSIONS_BUS', 'file') == 'file':
+            directory = app.config.get('TABLE_VERSIONS_DIR') or os.path.join(app.instance_path, 'table_versions')
+            self.bus = FileInvalidationBus(directory)
+
+    def version(self, table):
+        return self.bus.version(table)
+
+    def modified(self, table):
+        return self.bus.modified(table)
+
+    def bump(self, table):
+        self.bus.bump(table)
+
+# Antwort kam von einem Replikat, das die letzte Änderung evtl. noch nicht enthält: keine Validatoren vergeben,
+# sonst bliebe der veraltete Stand beim Client bis zur nächsten Änderung gültig
+def _maybe_stale_replica(modified):
+    router = current_app.extensions.get('replica_router')
+    return g.get('db_route') == 'replica' and router is not None and time.time() - modified < router.window
+
+# Route-Decorator: beantwortet bedingte GET-Anfragen mit 304, solange sich die Tabelle nicht geändert hat.
+# Der Validator wird vor dem Aufruf der View berechnet, sodass bei einem Treffer weder Datenbank-
+# Abfrage noch Serialisierung stattfinden.
+def conditional_get(table_versions, table):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = table_versions.version(table)
+            modified = table_versions.modified(table)
+            # Anfrage (Pfad inkl. Query-String) fliesst in den ETag ein, da die Antwort davon abhängt
+            digest = zlib.crc32(request.full_path.encode()) & 0xffffffff
+            etag = '%s-%d-%d-%08x' % (table, version, int(modified * 1000), digest)
+            last_modified = formatdate(modified, usegmt=True)
+
+            not_modified = False
+            if request.if_none_match:
+                # Auch der ETag der gzip-Darstellung gilt (siehe compression.py)
+                if request.if_none_match.contains(etag + GZIP_ETAG_SUFFIX):
+                    etag += GZIP_ETAG_SUFFIX
+                    not_modified = True
+                else:
+                    not_modified = request.if_none_match.contains(etag)
+            elif request.if_modified_since is not None:
+                # Last-Modified hat nur Sekundengenauigkeit: Änderungen der letzten Sekunde nie bestätigen
+                not_modified = time.time() - modified > 1 and int(modified) <= request.if_modified_since.timestamp()
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or _maybe_stale_replica(modified):
+                    return response
+            response.set_etag(etag)
+            response.headers['Last-Modified'] = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache' # Immer revalidieren
+            return response
+        return wrapper
+    return decorator
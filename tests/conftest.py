@@ -0,0 +1,76 @@
+# Module liegen im Projektverzeichnis (ohne Paket)
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from config import Config
+from engine_profiles import engine_options
+
+# Konfiguration für Tests: eigene SQLite-Datei, Zustand nur im Prozess (keine Dateien unter instance/)
+def make_config(directory, **overrides):
+    uri = 'sqlite:///' + str(directory / 'app.db')
+    values = dict(
+        TESTING=True,
+        SECRET_KEY='test',
+        WTF_CSRF_ENABLED=False,
+        SQLALCHEMY_DATABASE_URI=uri,
+        SQLALCHEMY_ENGINE_OPTIONS=engine_options(uri),
+        SQLALCHEMY_BINDS={},
+        AVAILABILITY_CACHE_BUS='local',
+        CALENDAR_CACHE_BUS='local',
+        TABLE_VERSIONS_BUS='local',
+        AVAILABILITY_EVENTS_BROKER='local',
+        IDEMPOTENCY_STORE='memory',
+        ADMISSION_ENABLED=False,
+        METRICS_ENABLED=False,
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+        PASSWORD_HASH_WORKERS=0,
+    )
+    values.update(overrides)
+    return type('TestConfig', (Config,), values)
+
+# Fabrik für Anwendungen mit leerer Datenbank, zwei Benutzern ("a", "b", Passwort "pw") und zwei Autos
+@pytest.fixture
+def make_app(tmp_path):
+    from app import create_app, db
+    from models import User, Car
+    apps = []
+
+    def make(name='app', profile='web', **overrides):
+        directory = tmp_path / name
+        directory.mkdir()
+        app = create_app(profile, make_config(directory, **overrides))
+        with app.app_context():
+            db.create_all()
+            for username in ('a', 'b'):
+                user = User(username=username, email='%s@example.ch' % username)
+                user.set_password('pw')
+                db.session.add(user)
+            db.session.add(Car(model='Golf', brand='VW', license_plate='ZH-1'))
+            db.session.add(Car(model='A3', brand='Audi', license_plate='ZH-2'))
+            db.session.commit()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+# Authorization-Header eines per /api/login angemeldeten Benutzers
+@pytest.fixture
+def auth_headers(client):
+    def login(username='a'):
+        response = client.post('/api/login', json={'username': username, 'password': 'pw'})
+        return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
+    return login
@@ -0,0 +1,23 @@
+import time
+from admission import FileBucketStore, MemoryBucketStore
+
+# Zwei Routen mit unterschiedlichen Grenzen in derselben Shard-Datei: der Eintrag der
+# grosszügigeren Route darf beim Zugriff auf die knappere nicht als "voll" entfernt werden
+def test_file_store_prunes_each_bucket_with_its_own_limits(tmp_path):
+    store = FileBucketStore(str(tmp_path), shards=1)
+    memory = MemoryBucketStore()
+    passes = {'file': 0, 'memory': 0}
+    for _ in range(20):
+        for name, s in (('file', store), ('memory', memory)):
+            if s.take('api.get_bookings|user:1', 0.001, 5) == 0:
+                passes[name] += 1
+            s.take('api.create_bookings_batch|user:2', 0.001, 3)
+    assert passes == {'file': 5, 'memory': 5}
+
+def test_file_store_drops_full_buckets(tmp_path):
+    store = FileBucketStore(str(tmp_path), shards=1)
+    store.take('a', 1000, 2)
+    time.sleep(0.01)
+    store.take('b', 1000, 2)
+    content = (tmp_path / '00.json').read_text()
+    assert '"a"' not in content and '"b"' in content
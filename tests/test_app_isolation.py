@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from app import db
+from booking_service import is_available
+from models import Booking
+
+def future(days, hour):
+    return (datetime.now() + timedelta(days=days)).replace(hour=hour, minute=0, second=0, microsecond=0)
+
+# Jede Anwendung erhält eigene Instanzen der Erweiterungen
+def test_extensions_are_per_app(make_app):
+    first, second = make_app('first'), make_app('second')
+    for name in ('availability_cache', 'slot_calendar', 'table_versions', 'metrics', 'admission', 'idempotency'):
+        assert first.extensions[name] is not second.extensions[name]
+
+# Ein Commit erhöht den Zähler genau einmal und nur in der eigenen Anwendung (keine doppelten Listener)
+def test_table_versions_are_per_app(make_app):
+    first, second = make_app('first'), make_app('second')
+    with second.app_context():
+        before = second.extensions['table_versions'].version('booking')
+    with first.app_context():
+        start = first.extensions['table_versions'].version('booking')
+        db.session.add(Booking(user_id=1, car_id=1, start_date=future(1, 10), end_date=future(1, 12)))
+        db.session.commit()
+        assert first.extensions['table_versions'].version('booking') == start + 1
+    with second.app_context():
+        assert second.extensions['table_versions'].version('booking') == before
+
+# Der Verfügbarkeits-Cache einer Anwendung wird nicht für die Datenbank einer anderen verwendet
+def test_availability_cache_is_per_app(make_app):
+    first, second = make_app('first'), make_app('second')
+    start, end = future(1, 10), future(1, 12)
+    with first.app_context():
+        db.session.add(Booking(user_id=1, car_id=1, start_date=start, end_date=end))
+        db.session.commit()
+        assert not is_available(1, start, end)
+    with second.app_context():
+        assert is_available(1, start, end)
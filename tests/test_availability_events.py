@@ -0,0 +1,24 @@
+from flask import Flask
+from availability_events import AvailabilityEvents
+
+def make_events(max_streams):
+    app = Flask(__name__)
+    app.config.update(AVAILABILITY_EVENTS_BROKER='local', AVAILABILITY_EVENTS_MAX_STREAMS=max_streams)
+    return app, AvailabilityEvents(app)
+
+# Weitere Verbindungen werden abgewiesen, bis eine offene Antwort geschlossen wird
+def test_stream_limit_per_worker():
+    app, events = make_events(2)
+    with app.test_request_context():
+        first, second = events.stream([1]), events.stream([1])
+        rejected = events.stream([1])
+        assert (first.status_code, second.status_code, rejected.status_code) == (200, 200, 503)
+        assert rejected.headers['Retry-After'] == '60'
+        first.close() # Auch ohne gelesene Daten (Client sofort getrennt)
+        assert events.stream([1]).status_code == 200
+    assert events.collect_metrics() == [('availability_streams_rejected_total', {}, 1)]
+
+def test_stream_without_limit():
+    app, events = make_events(0)
+    with app.test_request_context():
+        assert all(events.stream([1]).status_code == 200 for _ in range(10))
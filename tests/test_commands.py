@@ -0,0 +1,14 @@
+import io
+import json
+from commands import ImportReport, read_rows
+
+# Ungültige NDJSON-Zeilen werden abgelehnt, die übrigen Zeilen weiter gelesen
+def test_read_rows_rejects_invalid_ndjson_lines():
+    rejects = io.StringIO()
+    report = ImportReport(rejects)
+    file = io.StringIO('{"a": 1}\n{"a": \n\n[1]\n{"a": 2}\n')
+    file.name = 'cars.ndjson'
+    assert list(read_rows(file, None, report)) == [{'a': 1}, {'a': 2}]
+    assert report.rejected == 2
+    assert [json.loads(line)['error'] for line in rejects.getvalue().splitlines()] == \
+        ['Ungültiges JSON in Zeile 2', 'Zeile 4 ist kein JSON-Objekt']
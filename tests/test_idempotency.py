@@ -0,0 +1,26 @@
+import threading
+import time
+from idempotency import BUSY, DONE, MISMATCH, NEW, MemoryIdempotencyStore
+
+def test_wait_returns_when_completed_before_wait():
+    store = MemoryIdempotencyStore()
+    assert store.begin('k', 'fp', 30)[0] == NEW
+    assert store.begin('k', 'fp', 30)[0] == BUSY
+    # complete() läuft zwischen begin() und wait() des Duplikats: darf nicht bis zum Timeout warten
+    store.complete('k', {'fingerprint': 'fp', 'expires': time.time() + 60, 'status': 201})
+    started = time.monotonic()
+    store.wait('k', 5)
+    assert time.monotonic() - started < 1
+    result, record = store.begin('k', 'fp', 30)
+    assert (result, record['status']) == (DONE, 201)
+    assert store.begin('k', 'other', 30)[0] == MISMATCH
+
+def test_wait_wakes_up_on_abort():
+    store = MemoryIdempotencyStore()
+    store.begin('k', 'fp', 30)
+    timer = threading.Timer(0.05, store.abort, ['k'])
+    timer.start()
+    started = time.monotonic()
+    store.wait('k', 5)
+    assert time.monotonic() - started < 1
+    assert store.begin('k', 'fp', 30)[0] == NEW
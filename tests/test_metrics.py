@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from flask import Flask
+from metrics import Metrics
+
+def make_metrics(directory):
+    app = Flask(__name__)
+    app.config.update(METRICS_DIR=str(directory))
+    return Metrics(app)
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+# Gleichzeitige Schreibvorgänge mehrerer Threads dürfen sich nicht gegenseitig stören
+def test_concurrent_flush(tmp_path):
+    metrics = make_metrics(tmp_path)
+    metrics.define('test_total', 'counter', '')
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(50):
+                metrics.inc('test_total')
+                metrics.flush()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert metrics.collect()[0][('test_total', ())] == 400
+    assert not list(tmp_path.glob('.*.tmp'))
+
+# Zähler beendeter Prozesse bleiben erhalten, auch wenn ein neuer Prozess dieselbe PID bekommt
+def test_stale_files_are_archived(tmp_path):
+    data = {'counters': [['test_total', [], 5]], 'histograms': []}
+    (tmp_path / ('%d.json' % dead_pid())).write_text(json.dumps(data))
+    metrics = make_metrics(tmp_path)
+    assert [path.name for path in tmp_path.glob('*.json')] == ['archived.json']
+
+    (tmp_path / ('%d.json' % os.getpid())).write_text(json.dumps(data)) # Vorgänger mit derselben PID
+    metrics.inc('test_total', value=2)
+    metrics.flush()
+    assert metrics.collect()[0][('test_total', ())] == 12
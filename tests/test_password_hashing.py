@@ -0,0 +1,38 @@
+import threading
+import pytest
+from flask import Flask
+from werkzeug.security import generate_password_hash
+from password_hashing import HashPoolBusy, PasswordHasher
+
+def make_hasher(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return PasswordHasher(app)
+
+# Kurzformen wie "pbkdf2:sha256" werden beim Hashen um die Standardparameter ergänzt
+@pytest.mark.parametrize('method', ['pbkdf2:sha256', 'pbkdf2:sha256:1000', 'scrypt'])
+def test_needs_rehash_accepts_short_method_names(method):
+    hasher = make_hasher(PASSWORD_HASH_METHOD=method)
+    assert not hasher.needs_rehash(generate_password_hash('pw', method))
+    assert hasher.needs_rehash(generate_password_hash('pw', 'pbkdf2:sha256:999'))
+
+def test_timeout_raises_and_drops_queued_hash():
+    hasher = make_hasher(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_TIMEOUT=0.05)
+    release = threading.Event()
+    blocker = hasher.executor.submit(release.wait) # Einzigen Pool-Thread belegen
+    with pytest.raises(HashPoolBusy):
+        hasher.hash('pw')
+    release.set()
+    blocker.result()
+    hasher.executor.shutdown(wait=True)
+    assert hasher.timers['hash'].count == 0 # Wartende Berechnung wurde verworfen
+
+def test_prefix_is_computed_on_first_use():
+    hasher = make_hasher(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    assert hasher._prefix is None
+    assert hasher.prefix == 'pbkdf2:sha256:1000'
+
+def test_without_pool():
+    hasher = make_hasher(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', PASSWORD_HASH_WORKERS=0)
+    assert hasher.verify(hasher.hash('pw'), 'pw')
+    assert hasher._executor is None
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from app import db
+from models import Car
+from query_stats import assert_query_budget
+
+FORM_FORMAT = '%Y-%m-%dT%H:%M'
+
+def web_login(client, username='a'):
+    response = client.post('/login', data={'username': username, 'password': 'pw'})
+    assert response.status_code == 302
+
+def check(client, car_id, start, end):
+    body = {'car_id': car_id, 'start_date': start.strftime(FORM_FORMAT), 'end_date': end.strftime(FORM_FORMAT)}
+    return client.post('/check_availability', json=body)
+
+# Buchungsseite: Autos und eigene Buchungen (inkl. Auto) mit je einer Abfrage, unabhängig von der Anzahl
+def test_bookings_page_query_budget(app, client):
+    web_login(client)
+    start = datetime.now().replace(microsecond=0) + timedelta(days=1)
+    for i in range(5):
+        response = client.post('/bookings', data={
+            'car_id': 1 + i % 2,
+            'start_date': (start + timedelta(days=i)).strftime(FORM_FORMAT),
+            'end_date': (start + timedelta(days=i, hours=2)).strftime(FORM_FORMAT),
+        })
+        assert response.status_code == 302
+    with app.app_context(): # Nicht mehr in der Autoliste: das Template lädt das Auto über die Buchung
+        db.session.get(Car, 2).available = False
+        db.session.commit()
+    response = assert_query_budget(client, '/bookings', 2)
+    assert response.status_code == 200
+    assert response.data.count(b'ZH-2') >= 2
+
+# Die Auto-ID des Formulars kommt als String an; Cache und Invalidierung verwenden int-Schlüssel
+def test_check_availability_after_booking(client):
+    web_login(client)
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=2)
+    end = start + timedelta(hours=2)
+    assert check(client, '1', start, end).get_json()['available'] is True
+    client.post('/bookings', data={'car_id': 1, 'start_date': start.strftime(FORM_FORMAT),
+                                   'end_date': end.strftime(FORM_FORMAT)})
+    assert check(client, '1', start + timedelta(hours=1), end).get_json()['available'] is False
+    assert check(client, 1, start + timedelta(hours=1), end).get_json()['available'] is False
+    assert check(client, '2', start, end).get_json()['available'] is True
+
+def test_check_availability_rejects_invalid_data(client):
+    web_login(client)
+    start = datetime(2031, 1, 1, 10)
+    assert check(client, 'abc', start, start + timedelta(hours=1)).status_code == 400
+    assert check(client, [1], start, start + timedelta(hours=1)).status_code == 400
+    assert client.post('/check_availability', data='x').status_code == 400
+    assert client.post('/check_availability', json={'car_id': 1}).get_json() == {'error': 'Ungültige Daten'}
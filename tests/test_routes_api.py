@@ -0,0 +1,192 @@
+import base64
+from datetime import datetime, timedelta
+from app import db
+from models import Booking, BookingArchive
+from query_stats import assert_query_budget, query_budget
+
+API_FORMAT = '%Y-%m-%d %H:%M'
+
+def add_bookings(app, windows, user_id=1, car_id=1):
+    with app.app_context():
+        bookings = [Booking(user_id=user_id, car_id=car_id, start_date=start, end_date=end) for start, end in windows]
+        db.session.add_all(bookings)
+        db.session.commit()
+        return [booking.id for booking in bookings]
+
+def booking_json(car_id, start, end):
+    return {'car_id': car_id, 'start_date': start.strftime(API_FORMAT), 'end_date': end.strftime(API_FORMAT)}
+
+def booking_count(app):
+    with app.app_context():
+        return Booking.query.count()
+
+# Die Liste kostet unabhängig von der Anzahl Buchungen gleich viele Abfragen (kein N+1). Beim ersten
+# Aufruf wird zusätzlich der Archiv-Horizont geladen (einmal pro Version der Archivtabelle).
+def test_bookings_query_budget(app, client, auth_headers):
+    headers = auth_headers()
+    start = datetime(2031, 1, 1, 10)
+    add_bookings(app, [(start + timedelta(days=i), start + timedelta(days=i, hours=2)) for i in range(20)])
+    response = assert_query_budget(client, '/api/bookings', 2, headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 20
+    assert assert_query_budget(client, '/api/bookings?limit=5', 1, headers=headers).status_code == 200
+
+# Jeder Eintrag des Stapels erhält ein eigenes Ergebnis; gespeichert werden nur die konfliktfreien
+def test_batch_reports_result_per_item(app, client, auth_headers):
+    start = datetime(2031, 2, 1, 10)
+    add_bookings(app, [(start + timedelta(days=1), start + timedelta(days=1, hours=2))])
+    items = [
+        booking_json(1, start, start + timedelta(hours=2)),
+        booking_json(1, start + timedelta(hours=1), start + timedelta(hours=3)), # Überschneidung im Stapel
+        booking_json(1, start + timedelta(days=1, hours=1), start + timedelta(days=1, hours=3)), # Bestehende Buchung
+        booking_json(99, start, start + timedelta(hours=2)),
+        {'car_id': 2, 'start_date': 'x', 'end_date': 'y'},
+        booking_json(2, start, start + timedelta(hours=2)),
+    ]
+    response = client.post('/api/bookings/batch', json={'bookings': items}, headers=auth_headers())
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['created'] == 2
+    assert [result['status'] for result in data['results']] == \
+        ['created', 'conflict', 'conflict', 'invalid', 'invalid', 'created']
+    assert data['results'][1]['error'] == 'Überschneidung mit einer anderen Buchung im Stapel'
+    assert data['results'][2]['error'] == 'Auto ist in diesem Zeitraum bereits gebucht'
+    assert data['results'][3]['error'] == 'Auto nicht gefunden'
+    assert booking_count(app) == 3
+
+def test_batch_rejects_invalid_payload(client, auth_headers):
+    headers = auth_headers()
+    assert client.post('/api/bookings/batch', json={'bookings': []}, headers=headers).status_code == 400
+    assert client.post('/api/bookings/batch', data='x', headers=headers).status_code == 400
+
+# Keyset-Pagination über Live-Tabelle und Archiv: jede Buchung genau einmal, aufsteigend nach ID
+def test_pagination_across_archive(app, client, auth_headers):
+    headers = auth_headers()
+    past, future = datetime(2020, 1, 1, 10), datetime(2031, 1, 1, 10)
+    windows = []
+    for i in range(7): # Abwechselnd abgeschlossene und zukünftige Buchungen (IDs gemischt)
+        base = past if i % 2 == 0 else future
+        windows.append((base + timedelta(days=i), base + timedelta(days=i, hours=2)))
+    ids = add_bookings(app, windows)
+    result = app.test_cli_runner().invoke(args=['archive-bookings', '--batch-size', '2'])
+    assert 'Fertig: 4 Buchungen archiviert' in result.output
+    with app.app_context():
+        assert BookingArchive.query.count() == 4
+
+    seen, url = [], '/api/bookings?limit=2'
+    while True:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        seen += [booking['id'] for booking in response.get_json()]
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        url = '/api/bookings?limit=2&after=%s' % response.headers['X-Next-Cursor']
+    assert seen == ids
+
+    # Ohne Bezug zum Archiv (from nach dem Horizont) nur die Live-Tabelle
+    response = client.get('/api/bookings?from=2030-01-01 00:00', headers=headers)
+    assert [booking['id'] for booking in response.get_json()] == ids[1::2]
+
+# Bedingte GET-Anfragen: 304 ohne Datenbankabfrage, neuer ETag nach einer Änderung
+def test_conditional_get(app, client, auth_headers):
+    headers = auth_headers()
+    start = datetime(2031, 3, 1, 10)
+    add_bookings(app, [(start, start + timedelta(hours=2))])
+    response = client.get('/api/bookings', headers=headers)
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and response.headers['Last-Modified']
+
+    with query_budget(0):
+        response = client.get('/api/bookings', headers=dict(headers, **{'If-None-Match': etag}))
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+    # Andere Query-Parameter ergeben einen anderen ETag
+    other = client.get('/api/bookings?limit=1', headers=dict(headers, **{'If-None-Match': etag}))
+    assert other.status_code == 200 and other.headers['ETag'] != etag
+
+    client.post('/api/bookings', json=booking_json(2, start, start + timedelta(hours=2)), headers=headers)
+    response = client.get('/api/bookings', headers=dict(headers, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()) == 2
+
+# Komprimierte Antworten haben einen eigenen ETag, der ebenfalls bestätigt wird
+def test_conditional_get_with_gzip(app, client, auth_headers):
+    headers = dict(auth_headers(), **{'Accept-Encoding': 'gzip'})
+    start = datetime(2031, 3, 1, 10)
+    add_bookings(app, [(start + timedelta(days=i), start + timedelta(days=i, hours=2)) for i in range(30)])
+    response = client.get('/api/bookings', headers=headers)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+    response = client.get('/api/bookings', headers=dict(headers, **{'If-None-Match': etag}))
+    assert response.status_code == 304
+
+# Wiederholungen mit gleichem Idempotency-Key liefern die erste Antwort, ohne erneut zu buchen
+def test_idempotent_replay(app, client, auth_headers):
+    start = datetime(2031, 4, 1, 10)
+    body = booking_json(1, start, start + timedelta(hours=2))
+    headers = dict(auth_headers(), **{'Idempotency-Key': 'booking-1'})
+    first = client.post('/api/bookings', json=body, headers=headers)
+    second = client.post('/api/bookings', json=body, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.get_json() == first.get_json()
+    assert 'Idempotent-Replayed' not in first.headers
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert booking_count(app) == 1
+
+    # Gleicher Schlüssel mit anderem Inhalt wird abgelehnt
+    other = booking_json(2, start, start + timedelta(hours=2))
+    assert client.post('/api/bookings', json=other, headers=headers).status_code == 422
+
+    # Schlüssel gelten pro Benutzer
+    response = client.post('/api/bookings', json=other, headers=dict(auth_headers('b'), **{'Idempotency-Key': 'booking-1'}))
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert booking_count(app) == 2
+
+def test_idempotency_key_is_validated(client, auth_headers):
+    start = datetime(2031, 4, 1, 10)
+    headers = dict(auth_headers(), **{'Idempotency-Key': 'x' * 300})
+    assert client.post('/api/bookings', json=booking_json(1, start, start + timedelta(hours=1)), headers=headers).status_code == 400
+
+def free_bits(car):
+    bitmap = base64.b64decode(car['free'])
+    bits = ''.join(format(byte, '08b') for byte in bitmap)
+    return bits[:car['slots']]
+
+# Kalender: Anzahl Slots pro Monat, belegte Slots und Nachführen des Caches nach Buchung und Storno
+def test_calendar_slot_counts(app, client, auth_headers):
+    headers = auth_headers()
+    url = '/api/cars/calendar?car_id=1,2&month=2031-03&slot=%d'
+    response = client.get(url % 60, headers=headers)
+    assert response.status_code == 200
+    assert [(car['car_id'], car['slots'], car['free_slots']) for car in response.get_json()['cars']] == \
+        [(1, 744, 744), (2, 744, 744)]
+
+    # Nach dem ersten Abruf gecacht: die neue Buchung wird im Cache nachgeführt
+    created = client.post('/api/bookings', json=booking_json(1, datetime(2031, 3, 10, 10), datetime(2031, 3, 10, 12)),
+                          headers=headers).get_json()['booking_id']
+    client.post('/api/bookings', json=booking_json(1, datetime(2031, 3, 31, 23), datetime(2031, 4, 1, 1)), headers=headers)
+    cars = client.get(url % 60, headers=headers).get_json()['cars']
+    assert [(car['slots'], car['free_slots']) for car in cars] == [(744, 741), (744, 744)]
+    bits = free_bits(cars[0])
+    slot = 9 * 24 + 10 # 10. März, 10:00
+    assert bits[slot - 1:slot + 3] == '1001'
+    assert bits[-1] == '0'
+
+    quarter = client.get(url % 15, headers=headers).get_json()['cars'][0]
+    assert (quarter['slots'], quarter['free_slots']) == (2976, 2964)
+    april = client.get('/api/cars/calendar?car_id=1&month=2031-04', headers=headers).get_json()['cars'][0]
+    assert (april['slots'], april['free_slots']) == (720, 719)
+
+    client.delete('/api/bookings/%d' % created, headers=headers)
+    car = client.get(url % 60, headers=headers).get_json()['cars'][0]
+    assert car['free_slots'] == 743
+
+def test_calendar_rejects_invalid_parameters(client, auth_headers):
+    headers = auth_headers()
+    assert client.get('/api/cars/calendar?car_id=1,99&month=2031-03', headers=headers).status_code == 404
+    assert client.get('/api/cars/calendar?car_id=1&month=03-2031', headers=headers).status_code == 400
+    assert client.get('/api/cars/calendar?car_id=1&month=2031-03&slot=30', headers=headers).status_code == 400
@@ -0,0 +1,66 @@
+# Kleiner TTL-Cache mit LRU-Verdrängung für die Benutzer-Identität (Flask-Login user_loader)
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl # Sekunden
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # Schlüssel -> (Ablaufzeit, Wert)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key] # Abgelaufen
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False) # Am längsten nicht genutzten Eintrag verdrängen
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._entries)}
+
+# Flask-Erweiterung: Cache-Instanz mit Werten aus der Konfiguration
+class UserCache(TTLCache):
+    def __init__(self, app=None):
+        super().__init__()
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USER_CACHE_ENABLED', True)
+        self.maxsize = app.config.get('USER_CACHE_SIZE', 10000)
+        self.ttl = app.config.get('USER_CACHE_TTL', 60)
+
+    # Werte für metrics.Metrics.register_collector()
+    def collect_metrics(self):
+        return [
+            ('user_cache_hits_total', {}, self.hits),
+            ('user_cache_misses_total', {}, self.misses),
+            ('user_cache_evictions_total', {}, self.evictions),
+        ]